@@ -1,12 +1,28 @@
+from django.utils.functional import SimpleLazyObject
+
 from .models import Cart
 
+EMPTY_SUMMARY = {"total_quantity": 0, "subtotal": 0}
 
-def cart_summary(request):
+
+def _summary_for(request):
     try:
-        cart = Cart.get_or_create_for_request(request)
-        return {
-            "cart_total_quantity": cart.total_quantity,
-            "cart_subtotal": cart.subtotal,
-        }
+        summary = Cart.summary_for_request(request)
     except Exception:
-        return {"cart_total_quantity": 0, "cart_subtotal": 0}
+        return EMPTY_SUMMARY
+    return summary or EMPTY_SUMMARY
+
+
+def cart_summary(request):
+    """Expose the cart badge lazily.
+
+    Nothing is looked up unless a template actually renders the badge, and the
+    lookup is read-only, so no session or cart row is created for visitors that
+    never added anything.
+    """
+    summary = SimpleLazyObject(lambda: _summary_for(request))
+    return {
+        "cart_summary": summary,
+        "cart_total_quantity": SimpleLazyObject(lambda: summary["total_quantity"]),
+        "cart_subtotal": SimpleLazyObject(lambda: summary["subtotal"]),
+    }
@@ -0,0 +1,78 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete abandoned anonymous carts (and their items) in small batches. "
+        "Safe to run on a live site: every batch is a short transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of carts deleted per transaction",
+        )
+        parser.add_argument(
+            "--older-than-days",
+            type=float,
+            default=settings.SESSION_COOKIE_AGE / 86400,
+            help="Only carts not updated for this many days (default: session age)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, to leave room for live traffic",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many carts and items would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+
+        if options["dry_run"]:
+            carts = Cart.abandoned(cutoff)
+            items = CartItem.objects.filter(cart__in=carts.values("pk"))
+            self.stdout.write(
+                f"Would delete {carts.count()} carts and {items.count()} items "
+                f"not updated since {cutoff:%Y-%m-%d %H:%M}."
+            )
+            return
+
+        started = time.monotonic()
+        total_carts = total_items = batches = 0
+        while True:
+            batch = Cart.purge_abandoned(cutoff, options["batch_size"])
+            if batch is None:
+                # Out of candidates; a batch whose carts were all revived
+                # meanwhile deletes nothing but does not end the purge
+                break
+            carts, items = batch
+            batches += 1
+            total_carts += carts
+            total_items += items
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Batch {batches}: {carts} carts, {items} items")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        elapsed = time.monotonic() - started
+        rate = total_carts / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {total_carts} carts and {total_items} items in {batches} "
+                f"batches ({elapsed:.2f}s, {rate:.0f} carts/s)."
+            )
+        )
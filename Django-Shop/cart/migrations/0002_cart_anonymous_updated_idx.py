@@ -0,0 +1,22 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cart", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["updated_at"],
+                name="cart_anonymous_updated_idx",
+            ),
+        ),
+    ]
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+from datetime import timedelta
 from decimal import Decimal
 
 from django.conf import settings
-from django.db import models, transaction
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from orders.models import StockReservation
+from config.caching import cached_computation, update_cached_computation
+from products.page_cache import get_catalog_version
+
 from .exceptions import (
     MaxPerItemExceeded,
     OutOfStock,
@@ -14,7 +22,64 @@ from .exceptions import (
 )
 
 
-class Cart(models.Model):
+class CartRules:
+    """Validation shared by every cart storage (``Cart`` and ``SessionCart``)."""
+
+    def _parse_quantity(self, value, default=1):
+        """Parse and validate quantity input from request data."""
+        if value is None or value == "":
+            return default
+
+        try:
+            qty = int(value)
+        except (ValueError, TypeError):
+            raise QuantityNotPositive("Quantity must be a valid number")
+
+        return qty
+
+    def _check_available(self, product) -> int:
+        """Raise if the product cannot be added; return its available stock.
+
+        Units held for pending orders (``StockReservation``) are not available,
+        so a cart never promises stock that checkout would refuse. Products
+        loaded through ``StockReservation.with_available_stock`` skip the query.
+        """
+        if product.is_available and product.stock > 0:
+            available = getattr(product, "available_stock", None)
+            if available is None:
+                available = StockReservation.available_stock([product.pk]).get(
+                    product.pk, 0
+                )
+            if available > 0:
+                return available
+        raise ProductUnavailable(f"Product '{product.name}' is not available")
+
+    def _check_line_limits(self, product, new_total, available):
+        """Raise if a line of ``new_total`` units breaks the per-item or stock limit."""
+        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
+        if new_total > max_allowed:
+            raise MaxPerItemExceeded(
+                f"Maximum {max_allowed} per item for '{product.name}'"
+            )
+        if new_total > available:
+            raise OutOfStock(f"Only {available} available for '{product.name}'!")
+
+    def _line_limit_error(self, product, available):
+        """The error for a line known to exceed ``min(per-item max, available)``."""
+        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
+        if max_allowed <= available:
+            return MaxPerItemExceeded(
+                f"Maximum {max_allowed} per item for '{product.name}'"
+            )
+        return OutOfStock(f"Only {available} available for '{product.name}'!")
+
+    def _clamp_quantity(self, quantity, available):
+        """Clamp a requested line quantity to available stock and the per-item maximum."""
+        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
+        return min(quantity, available, max_allowed)
+
+
+class Cart(CartRules, models.Model):
     """Persistent cart. Anonymous users temporarily use session key until login.
 
     When an anonymous user logs in, their session cart can be merged into their user cart.
@@ -35,6 +100,12 @@ class Cart(models.Model):
         indexes = [
             models.Index(fields=["user"]),
             models.Index(fields=["session_key"]),
+            # Oldest anonymous carts first, for purge_carts
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(user__isnull=True),
+                name="cart_anonymous_updated_idx",
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -48,10 +119,57 @@ class Cart(models.Model):
         owner = self.user.email if self.user else self.session_key
         return f"Cart<{owner}>"
 
+    def delete(self, *args, **kwargs):
+        self.invalidate_summary()
+        return super().delete(*args, **kwargs)
+
+    # --- Garbage collection (purge_carts) ---
+    DB_SESSION_ENGINES = (
+        "django.contrib.sessions.backends.db",
+        "django.contrib.sessions.backends.cached_db",
+    )
+
+    @classmethod
+    def abandoned(cls, cutoff):
+        """Anonymous carts untouched since ``cutoff`` whose session is gone.
+
+        With a database session engine, carts whose session is still alive
+        (matched through the ``session_key`` index) are kept whatever their age.
+        """
+        carts = cls.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+        if settings.SESSION_ENGINE in cls.DB_SESSION_ENGINES:
+            from django.contrib.sessions.models import Session
+
+            live = Session.objects.filter(expire_date__gt=timezone.now())
+            carts = carts.exclude(session_key__in=live.values("session_key"))
+        return carts
+
+    @classmethod
+    def purge_abandoned(cls, cutoff, batch_size=1000):
+        """Delete one batch of abandoned carts (oldest first) and their items.
+
+        Each batch is its own short transaction; the candidates are re-checked
+        in the DELETE so a cart revived meanwhile survives, which can leave a
+        batch with nothing deleted. Returns ``(carts, items)`` deleted, or
+        ``None`` once there are no candidates left.
+        """
+        ids = list(
+            cls.abandoned(cutoff)
+            .order_by("updated_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return None
+        with transaction.atomic():
+            _, deleted = cls.abandoned(cutoff).filter(pk__in=ids).delete()
+        return deleted.get(cls._meta.label, 0), deleted.get(CartItem._meta.label, 0)
+
     @property
     def items(self):  # qs alias for consistency
-        return self.cart_items.select_related("product").prefetch_related(
-            "product__images"
+        from products.models import Product
+
+        return self.cart_items.prefetch_related(
+            Prefetch("product", queryset=Product.objects.with_card_data())
         )
 
     @property
@@ -66,141 +184,316 @@ class Cart(models.Model):
     def total(self) -> Decimal:  # hook for taxes / shipping later
         return self.subtotal
 
+    # --- Summary (navbar badge, AJAX responses) ---
+    SUMMARY_CACHE_TIMEOUT = 300
+
+    @property
+    def summary_cache_key(self) -> str:
+        # Keyed on the catalog version: a price or discount change retires
+        # every cached subtotal
+        return f"cart:{self.pk}:summary:{get_catalog_version()}"
+
+    def summary(self) -> dict:
+        """Return ``{"total_quantity", "subtotal"}`` computed in a single query.
+
+        The result is memoized on the instance and cached per cart and catalog
+        version (``cached_computation``, so one request recomputes a cold
+        summary); cart mutations below invalidate it or shift it by delta.
+        The cached subtotal is exact and only rounded here, so deltas add up
+        to what a fresh aggregate would return.
+        """
+        summary = getattr(self, "_summary", None)
+        if summary is None:
+            summary = cached_computation(
+                self.summary_cache_key,
+                self._compute_summary,
+                self.SUMMARY_CACHE_TIMEOUT,
+            )
+            self._summary = summary
+        return {
+            "total_quantity": summary["total_quantity"],
+            "subtotal": summary["subtotal"].quantize(Decimal("0.01")),
+        }
+
+    def _compute_summary(self) -> dict:
+        # Six places hold any price * (100 - discount) / 100 exactly
+        exact = DecimalField(max_digits=20, decimal_places=6)
+        price = F("product__price")
+        unit_price = price - price * F("product__discount_percent") / Value(100)
+        line_subtotal = ExpressionWrapper(
+            F("quantity") * unit_price, output_field=exact
+        )
+        totals = self.cart_items.aggregate(
+            total_quantity=Coalesce(Sum("quantity"), 0),
+            subtotal=Coalesce(
+                Sum(line_subtotal), Value(Decimal("0")), output_field=exact
+            ),
+        )
+        return {
+            "total_quantity": totals["total_quantity"],
+            "subtotal": Decimal(totals["subtotal"]),
+        }
+
+    def invalidate_summary(self):
+        self._summary = None
+        cache.delete(self.summary_cache_key)
+
+    def _apply_summary_delta(self, quantity, amount):
+        """Shift a known summary by one change instead of aggregating again."""
+
+        def shift(summary):
+            return {
+                "total_quantity": summary["total_quantity"] + quantity,
+                "subtotal": summary["subtotal"] + amount,
+            }
+
+        memoized = getattr(self, "_summary", None)
+        self._summary = update_cached_computation(
+            self.summary_cache_key, shift, self.SUMMARY_CACHE_TIMEOUT
+        )
+        if self._summary is None and memoized is not None:
+            self._summary = shift(memoized)
+
+    # Cart activity marker: bumped at most this often by add_product
+    TOUCH_INTERVAL = timedelta(minutes=5)
+
+    def touch(self):
+        """Bump ``updated_at`` unless it was bumped within ``TOUCH_INTERVAL``."""
+        now = timezone.now()
+        if self.updated_at and now - self.updated_at < self.TOUCH_INTERVAL:
+            return
+        Cart.objects.filter(pk=self.pk).update(updated_at=now)
+        self.updated_at = now
+
+    @classmethod
+    def summary_for_request(cls, request):
+        """Summary of the request's cart, ``None`` without one (memoized on it)."""
+        if not hasattr(request, "_cart_summary"):
+            cart = cls.get_for_request(request, create=False)
+            request._cart_summary = cart.summary() if cart else None
+        return request._cart_summary
+
     @classmethod
     def get_or_create_for_request(cls, request):
-        """Return a cart bound to user or session.
+        """Return a cart bound to user or session, creating it when missing."""
+        return cls.get_for_request(request, create=True)
+
+    @classmethod
+    def get_for_request(cls, request, create=False):
+        """Return the cart bound to the request's user or session.
 
-        - If user authenticated: ensure a user cart exists and merge session cart.
-        - Else: use/create session cart identified by request.session.session_key.
+        - If user authenticated: use the user cart and merge a pending session cart.
+        - Else: use the session cart identified by a sticky ``cart_id`` / session key,
+          or a ``SessionCart`` when ``CART_STORAGE = "session"``.
+
+        With ``create=False`` this is a read-only lookup: it returns ``None``
+        instead of creating a session or a cart row, so plain page views (and
+        crawlers) never write anything.
         """
+        from .session import SessionCart
+
         if request.user.is_authenticated:
-            cart, _ = cls.objects.get_or_create(user=request.user)
-            # Try to find an anonymous cart by a sticky cart_id first (survives session rotation),
-            # otherwise fall back to matching the current session_key.
-            anon_cart = None
-            cart_id = request.session.get("cart_id")
-            if cart_id:
-                try:
-                    anon_cart = cls.objects.get(pk=cart_id, user__isnull=True)
-                except cls.DoesNotExist:
-                    anon_cart = None
-
-            if anon_cart is None:
-                session_key = request.session.session_key
-                if session_key:
-                    try:
-                        anon_cart = cls.objects.get(
-                            session_key=session_key, user__isnull=True
-                        )
-                    except cls.DoesNotExist:
-                        anon_cart = None
+            anon_cart = cls._find_anonymous_cart(request)
+            session_lines = SessionCart.pending_lines(request)
+            if create or anon_cart is not None or session_lines:
+                cart, _ = cls.objects.get_or_create(user=request.user)
+            else:
+                cart = cls.objects.filter(user=request.user).first()
 
             if anon_cart and anon_cart.pk != cart.pk:
-                cart.merge_from(anon_cart)
-                anon_cart.delete()
+                cart.merge_from(anon_cart)  # also deletes the anonymous cart
                 # Clear the sticky id from session after merge
                 request.session.pop("cart_id", None)
+            if session_lines:
+                # First write of a session-stored cart to the database
+                cart.merge_quantities(session_lines)
+                SessionCart(request).forget()
             return cart
+
         # anonymous path
+        if SessionCart.enabled():
+            if not create and not SessionCart.pending_lines(request):
+                return None
+            return SessionCart(request)
+
+        if not create:
+            if not (request.session.session_key or request.session.get("cart_id")):
+                return None
+            return cls._find_anonymous_cart(request)
+
         if not request.session.session_key:
             request.session.create()
+        cart = cls._find_anonymous_cart(request)
+        if cart is None:
+            cart, _ = cls.objects.get_or_create(
+                session_key=request.session.session_key, user__isnull=True
+            )
+        # Persist the cart id in session to survive session key rotation (e.g., on login)
+        request.session["cart_id"] = cart.pk
+        return cart
+
+    @classmethod
+    def _find_anonymous_cart(cls, request):
+        """Find the anonymous cart for this session without creating anything.
+
+        Prefers a sticky ``cart_id`` in session (survives session key rotation),
+        otherwise falls back to matching the current session key.
+        """
         session_key = request.session.session_key
-        # Prefer a sticky cart id in session (so the same anon cart survives key rotation)
         cart_id = request.session.get("cart_id")
         if cart_id:
             try:
                 cart = cls.objects.get(pk=cart_id, user__isnull=True)
-                if cart.session_key != session_key:
+            except cls.DoesNotExist:
+                cart = None
+            else:
+                if (
+                    not request.user.is_authenticated
+                    and session_key
+                    and cart.session_key != session_key
+                ):
                     cart.session_key = session_key
                     cart.save(update_fields=["session_key", "updated_at"])
                 return cart
-            except cls.DoesNotExist:
-                pass
 
-        cart, _ = cls.objects.get_or_create(session_key=session_key, user__isnull=True)
-        # Persist the cart id in session to survive session key rotation (e.g., on login)
-        request.session["cart_id"] = cart.pk
-        return cart
+        if session_key:
+            return cls.objects.filter(
+                session_key=session_key, user__isnull=True
+            ).first()
+        return None
 
     def merge_from(self, other: "Cart"):
-        """Merge items from another cart into this cart (quantity additive)."""
+        """Merge another cart into this one and delete it (quantity additive)."""
         if other == self:
             return
         with transaction.atomic():
-            for item in other.items:
-                self.add(product=item.product, quantity=item.quantity, commit=False)
-            self.save(update_fields=["updated_at"])
+            self.merge_quantities(
+                dict(other.cart_items.values_list("product_id", "quantity"))
+            )
+            other.delete()
 
-    def add(self, product, quantity=1, commit=True):
-        item, created = CartItem.objects.select_for_update().get_or_create(
-            cart=self, product=product, defaults={"quantity": 0}
-        )
-        item.quantity += quantity
-        if item.quantity <= 0:
-            item.delete()
-        else:
-            item.save(update_fields=["quantity", "updated_at"])
-        if commit:
+    def merge_quantities(self, incoming: dict):
+        """Add ``{product_id: quantity}`` to this cart's lines.
+
+        Runs a constant number of queries whatever the number of lines: the
+        summed quantities are written with one upsert. Merged lines are clamped
+        to ``CART_MAX_ITEM_QTY`` and to the stock not held for pending orders;
+        lines for products that can no longer be bought are dropped.
+        """
+        from products.models import Product
+
+        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
+        with transaction.atomic():
+            current = dict(
+                self.cart_items.filter(product_id__in=incoming)
+                .select_for_update()
+                .values_list("product_id", "quantity")
+            )
+            available = dict(
+                StockReservation.with_available_stock(
+                    Product.objects.filter(pk__in=incoming, is_available=True)
+                )
+                .filter(available_stock__gt=0)
+                .values_list("pk", "available_stock")
+            )
+            now = timezone.now()
+            lines = [
+                CartItem(
+                    cart=self,
+                    product_id=product_id,
+                    quantity=min(
+                        current.get(product_id, 0) + quantity,
+                        max_allowed,
+                        available[product_id],
+                    ),
+                    updated_at=now,
+                )
+                for product_id, quantity in incoming.items()
+                if product_id in available
+            ]
+            CartItem.objects.bulk_create(
+                lines,
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity", "updated_at"],
+            )
             self.save(update_fields=["updated_at"])
-        return item
+        self.invalidate_summary()
 
     def set(self, product, quantity):
+        """Set the line to ``quantity`` (removed at 0); returns it, or None."""
+        item = None
         if quantity <= 0:
             CartItem.objects.filter(cart=self, product=product).delete()
         else:
-            CartItem.objects.update_or_create(
+            item, _ = CartItem.objects.update_or_create(
                 cart=self,
                 product=product,
                 defaults={"quantity": quantity, "updated_at": timezone.now()},
             )
-        self.save(update_fields=["updated_at"])
+        self.touch()
+        self.invalidate_summary()
+        return item
 
     def clear(self):
         self.items.all().delete()
         self.save(update_fields=["updated_at"])
+        self.invalidate_summary()
 
     # --- Domain operations (fat model pattern) ---
-    def _parse_quantity(self, value, default=1):
-        """Parse and validate quantity input from request data."""
-        if value is None or value == "":
-            return default
-
-        try:
-            qty = int(value)
-        except (ValueError, TypeError):
-            raise QuantityNotPositive("Quantity must be a valid number")
-
-        return qty
-
     def add_product(self, product, quantity=1):
-        """Add product to cart with business validation."""
+        """Add product to cart with business validation.
+
+        The line is read under a row lock and incremented with a conditional
+        ``UPDATE ... WHERE quantity <= limit - n``, so concurrent clicks cannot
+        push it past the limits. The cart timestamp is bumped at most once per
+        ``TOUCH_INTERVAL`` and the summary is updated by delta instead of being
+        aggregated again.
+        """
         # Basic validation
         if quantity <= 0:
             raise QuantityNotPositive(f"Quantity must be positive, got {quantity}")
 
-        if not (product.is_available and product.stock > 0):
-            raise ProductUnavailable(f"Product '{product.name}' is not available")
+        available = self._check_available(product)
 
-        # Get current quantity
-        existing = self.cart_items.filter(product=product).first()
-        current_quantity = existing.quantity if existing else 0
-        new_total = current_quantity + quantity
-
-        # Check constraints - raise exceptions if violated
-        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
-        if new_total > max_allowed:
-            raise MaxPerItemExceeded(
-                f"Maximum {max_allowed} per item for '{product.name}'"
-            )
-
-        if new_total > product.stock:
-            raise OutOfStock(f"Only {product.stock} available for '{product.name}'!")
-
-        # Add to cart
+        limit = min(getattr(settings, "CART_MAX_ITEM_QTY", 50), available)
         with transaction.atomic():
-            item = self.add(product=product, quantity=quantity)
-
-        return item, {"added_quantity": quantity, "final_quantity": new_total}
+            item, created = self._locked_line(product), False
+            if item is None:
+                self._check_line_limits(product, quantity, available)
+                try:
+                    with transaction.atomic():
+                        item = CartItem.objects.create(
+                            cart=self, product=product, quantity=quantity
+                        )
+                    created = True
+                except IntegrityError:
+                    # Added by a concurrent request: increment that line instead
+                    item = self._locked_line(product)
+
+            if not created:
+                new_total = item.quantity + quantity
+                self._check_line_limits(product, new_total, available)
+                incremented = CartItem.objects.filter(
+                    pk=item.pk, quantity__lte=limit - quantity
+                ).update(quantity=F("quantity") + quantity, updated_at=timezone.now())
+                if not incremented:
+                    # Grew past ``limit - quantity`` between our read and write
+                    # (backends without row locks)
+                    raise self._line_limit_error(product, available)
+                item.quantity = new_total
+            item.product = product
+            self.touch()
+
+        self._apply_summary_delta(quantity, product.discounted_price * quantity)
+        return item, {"added_quantity": quantity, "final_quantity": item.quantity}
+
+    def _locked_line(self, product):
+        return (
+            CartItem.objects.select_for_update()
+            .filter(cart=self, product=product)
+            .first()
+        )
 
     def set_product_quantity(self, product, quantity):
         """Set product quantity in cart."""
@@ -208,17 +501,12 @@ class Cart(models.Model):
             self.set(product, 0)
             return None, {"removed": True}
 
-        if not (product.is_available and product.stock > 0):
-            raise ProductUnavailable(f"Product '{product.name}' is not available")
+        available = self._check_available(product)
 
-        # Clamp to stock and max allowed per item
-        max_allowed = getattr(settings, "CART_MAX_ITEM_QTY", 50)
-        quantity = min(quantity, product.stock, max_allowed)
-
-        with transaction.atomic():
-            self.set(product, quantity)
+        # Clamp to available stock and max allowed per item
+        quantity = self._clamp_quantity(quantity, available)
 
-        item = self.cart_items.filter(product=product).first()
+        item = self.set(product, quantity)
         return item, {"final_quantity": quantity}
 
     def remove_product(self, product):
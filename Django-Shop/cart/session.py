@@ -0,0 +1,138 @@
+"""Session-stored carts for anonymous shoppers (``CART_STORAGE = "session"``).
+
+Most anonymous carts are abandoned, so instead of ``Cart``/``CartItem`` rows
+the lines live in the session as a compact ``{product_id: quantity}`` map.
+Whether that ends up in the cache, a signed cookie or the database is decided
+by ``SESSION_ENGINE``. The map is written to a database ``Cart`` when the
+shopper logs in (see ``Cart.get_for_request``), which checkout requires.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+
+from .exceptions import QuantityNotPositive
+from .models import CartRules
+
+
+@dataclass
+class SessionCartItem:
+    """A cart line backed by the session (mirrors ``CartItem``'s read API)."""
+
+    product: object
+    quantity: int
+
+    @property
+    def product_id(self):
+        return self.product.pk
+
+    @property
+    def unit_price(self):
+        return self.product.discounted_price
+
+    @property
+    def line_subtotal(self):
+        return self.unit_price * self.quantity
+
+
+class SessionCart(CartRules):
+    """Drop-in replacement for ``Cart`` that keeps its lines in the session."""
+
+    SESSION_KEY = "cart_lines"
+    pk = None
+
+    def __init__(self, request):
+        self.session = request.session
+        self.lines = self.pending_lines(request)
+        self._items = None
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, "CART_STORAGE", "db") == "session"
+
+    @classmethod
+    def pending_lines(cls, request) -> dict:
+        """The ``{product_id: quantity}`` map stored in the session, if any."""
+        lines = request.session.get(cls.SESSION_KEY) or {}
+        return {int(product_id): quantity for product_id, quantity in lines.items()}
+
+    def save(self):
+        self.session[self.SESSION_KEY] = {
+            str(product_id): quantity for product_id, quantity in self.lines.items()
+        }
+        self._items = None
+
+    def forget(self):
+        """Drop the stored lines (after they were written to a database cart)."""
+        self.session.pop(self.SESSION_KEY, None)
+        self.lines = {}
+        self._items = None
+
+    # --- Read API (same as Cart) ---
+    @property
+    def items(self):
+        """Lines with their products, newest first like ``CartItem``."""
+        if self._items is None:
+            from products.models import Product
+
+            products = Product.objects.with_card_data().in_bulk(self.lines)
+            self._items = [
+                SessionCartItem(products[product_id], quantity)
+                for product_id, quantity in reversed(self.lines.items())
+                if product_id in products
+            ]
+        return self._items
+
+    @property
+    def total_quantity(self) -> int:
+        return sum(item.quantity for item in self.items)
+
+    @property
+    def subtotal(self) -> Decimal:
+        return sum((item.line_subtotal for item in self.items), Decimal("0"))
+
+    @property
+    def total(self) -> Decimal:
+        return self.subtotal
+
+    def summary(self) -> dict:
+        return {
+            "total_quantity": self.total_quantity,
+            "subtotal": Decimal(self.subtotal).quantize(Decimal("0.01")),
+        }
+
+    # --- Domain operations (same contract as Cart) ---
+    def add_product(self, product, quantity=1):
+        if quantity <= 0:
+            raise QuantityNotPositive(f"Quantity must be positive, got {quantity}")
+        available = self._check_available(product)
+
+        new_total = self.lines.get(product.pk, 0) + quantity
+        self._check_line_limits(product, new_total, available)
+        self.lines[product.pk] = new_total
+        self.save()
+        return SessionCartItem(product, new_total), {
+            "added_quantity": quantity,
+            "final_quantity": new_total,
+        }
+
+    def set_product_quantity(self, product, quantity):
+        if quantity <= 0:
+            self.remove_product(product)
+            return None, {"removed": True}
+
+        available = self._check_available(product)
+        quantity = self._clamp_quantity(quantity, available)
+        self.lines[product.pk] = quantity
+        self.save()
+        return SessionCartItem(product, quantity), {"final_quantity": quantity}
+
+    def remove_product(self, product):
+        if self.lines.pop(product.pk, None) is not None:
+            self.save()
+        return {"removed": True}
+
+    def clear(self):
+        self.lines = {}
+        self.save()
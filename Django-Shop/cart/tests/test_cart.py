@@ -1,8 +1,12 @@
+import json
 from decimal import Decimal
 
 import pytest
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from model_bakery import baker
 
 from cart.exceptions import (
     MaxPerItemExceeded,
@@ -11,6 +15,7 @@ from cart.exceptions import (
     QuantityNotPositive,
 )
 from cart.models import Cart, CartItem
+from orders.models import Order, StockReservation
 
 # Use module-level django_db so individual tests don't need the decorator
 pytestmark = pytest.mark.django_db
@@ -64,6 +69,79 @@ def test_add_product_exceeds_max_per_item(cart, product_factory):
         cart.add_product(p, 6)
 
 
+def test_add_product_increments_in_three_queries_and_updates_summary(
+    cart, product_factory, django_assert_num_queries
+):
+    p = product_factory(stock=10, price=Decimal("20.00"))
+    cart.add_product(p, 1)
+    cart.summary()
+
+    # available stock + locked read + conditional UPDATE (plus the savepoint pair)
+    with django_assert_num_queries(5):
+        item, info = cart.add_product(p, 2)
+        summary = cart.summary()
+
+    assert item.quantity == info["final_quantity"] == 3
+    assert summary == {"total_quantity": 3, "subtotal": Decimal("60.00")}
+    cart.invalidate_summary()
+    assert cart.summary() == summary
+
+
+def test_add_product_leaves_out_stock_held_for_pending_orders(
+    cart, user, product_factory
+):
+    p = product_factory(stock=5)
+    order = baker.make(Order, user=user, total_amount=100)
+    order.items.create(product=p, quantity=4, price=p.price)
+    StockReservation.reserve(order)
+
+    with pytest.raises(OutOfStock, match="Only 1 available"):
+        cart.add_product(p, 2)
+    item, _ = cart.add_product(p, 1)
+    assert item.quantity == 1
+    _, info = cart.set_product_quantity(p, 5)
+    assert info["final_quantity"] == 1
+
+
+def test_add_product_rejects_increment_that_lost_a_race(cart, product_factory):
+    """The UPDATE re-checks the limit, even if the line grew after it was read."""
+    p = product_factory(stock=5)
+    cart.add_product(p, 2)
+    stale_read = CartItem.objects.get(cart=cart, product=p)
+    CartItem.objects.filter(pk=stale_read.pk).update(quantity=4)
+    cart._locked_line = lambda product: stale_read
+
+    with pytest.raises(OutOfStock):
+        cart.add_product(p, 2)
+    assert CartItem.objects.get(cart=cart, product=p).quantity == 4
+
+
+@override_settings(CART_MAX_ITEM_QTY=5)
+def test_increment_that_lost_a_race_reports_the_per_item_limit(cart, product_factory):
+    p = product_factory(stock=50)
+    cart.add_product(p, 2)
+    stale_read = CartItem.objects.get(cart=cart, product=p)
+    CartItem.objects.filter(pk=stale_read.pk).update(quantity=4)
+    cart._locked_line = lambda product: stale_read
+
+    with pytest.raises(MaxPerItemExceeded):
+        cart.add_product(p, 2)
+
+
+def test_add_product_touches_cart_at_most_once_per_interval(cart, product_factory):
+    p = product_factory(stock=10)
+    stale = cart.updated_at - Cart.TOUCH_INTERVAL * 2
+    Cart.objects.filter(pk=cart.pk).update(updated_at=stale)
+    cart.refresh_from_db()
+
+    cart.add_product(p, 1)
+    touched = Cart.objects.get(pk=cart.pk).updated_at
+    assert touched > stale
+
+    cart.add_product(p, 1)
+    assert Cart.objects.get(pk=cart.pk).updated_at == touched
+
+
 def test_set_product_quantity_zero_removes(cart, product_factory):
     p = product_factory(stock=5)
     cart.add_product(p, 3)
@@ -109,6 +187,11 @@ def test_add_to_cart_ajax_returns_json(ajax, product_factory):
     assert "Added" in data["message"]
     assert data["total_quantity"] == 5
     assert Decimal(data["subtotal"]) == Decimal("250.00")
+    assert data["line"] == {
+        "product_id": p.id,
+        "quantity": 5,
+        "line_subtotal": "250.00",
+    }
 
 
 def test_add_to_cart_ajax_out_of_stock_returns_400(ajax, product_factory):
@@ -212,7 +295,7 @@ def test_merge_adds_quantities_when_user_cart_already_has_items(
 
     # Pre-create a user cart with 4 of the same product
     user_cart = Cart.objects.create(user=user)
-    user_cart.add(product=p, quantity=4)
+    user_cart.add_product(p, 4)
 
     # Login without rotating the session key to preserve the anon session cart
     session = client.session
@@ -266,3 +349,250 @@ def test_merge_survives_session_rotation_on_login(client, user, product_factory)
     assert user_cart.cart_items.get(product=p2).quantity == 2
     # Old anon cart should be gone
     assert not Cart.objects.filter(pk=anon_cart.pk).exists()
+
+
+def _anon_cart_with(products, quantity=2):
+    anon = Cart.objects.create(session_key="sk-anon")
+    CartItem.objects.bulk_create(
+        CartItem(cart=anon, product=p, quantity=quantity) for p in products
+    )
+    return anon
+
+
+def test_merge_query_count_does_not_depend_on_line_count(user, product_factory):
+    def merge_queries(line_count):
+        user_cart, _ = Cart.objects.get_or_create(user=user)
+        anon = _anon_cart_with([product_factory() for _ in range(line_count)])
+        with CaptureQueriesContext(connection) as ctx:
+            user_cart.merge_from(anon)
+        return len(ctx.captured_queries)
+
+    assert merge_queries(2) == merge_queries(20)
+
+
+@override_settings(CART_MAX_ITEM_QTY=5)
+def test_merge_clamps_to_max_and_stock_and_drops_unavailable(user, product_factory):
+    capped = product_factory(stock=100)
+    scarce = product_factory(stock=3)
+    gone = product_factory(is_available=False)
+    user_cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=user_cart, product=capped, quantity=4)
+    anon = _anon_cart_with([capped, scarce, gone], quantity=4)
+
+    user_cart.merge_from(anon)
+
+    quantities = dict(user_cart.cart_items.values_list("product_id", "quantity"))
+    assert quantities == {capped.id: 5, scarce.id: 3}
+    assert not Cart.objects.filter(pk=anon.pk).exists()
+    assert not CartItem.objects.filter(cart_id=anon.pk).exists()
+
+
+def test_merge_leaves_out_stock_held_for_pending_orders(user, product_factory):
+    partly_held = product_factory(stock=5)
+    fully_held = product_factory(stock=2)
+    order = baker.make(Order, user=user, total_amount=100)
+    order.items.create(product=partly_held, quantity=3, price=partly_held.price)
+    order.items.create(product=fully_held, quantity=2, price=fully_held.price)
+    StockReservation.reserve(order)
+    user_cart = Cart.objects.create(user=user)
+    anon = _anon_cart_with([partly_held, fully_held], quantity=4)
+
+    user_cart.merge_from(anon)
+
+    quantities = dict(user_cart.cart_items.values_list("product_id", "quantity"))
+    assert quantities == {partly_held.id: 2}
+
+
+def test_failed_merge_keeps_anonymous_cart(user, product_factory, monkeypatch):
+    user_cart = Cart.objects.create(user=user)
+    anon = _anon_cart_with([product_factory()])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(Cart, "delete", fail)
+    with pytest.raises(RuntimeError):
+        user_cart.merge_from(anon)
+
+    assert not user_cart.cart_items.exists()
+    assert anon.cart_items.count() == 1
+
+
+# --- Summary tests ---
+
+
+def test_summary_matches_line_totals_in_one_query(
+    cart, product_factory, django_assert_num_queries
+):
+    p1 = product_factory(price=Decimal("100.00"), discount_percent=Decimal("10"))
+    p2 = product_factory(price=Decimal("20.00"))
+    cart.add_product(p1, 2)
+    cart.add_product(p2, 3)
+    cart.invalidate_summary()
+
+    with django_assert_num_queries(1):
+        summary = cart.summary()
+    assert summary["total_quantity"] == 5
+    assert summary["subtotal"] == Decimal("240.00")
+
+    # Memoized on the instance and cached for other instances of the same cart
+    with django_assert_num_queries(0):
+        cart.summary()
+    fresh = Cart.objects.get(pk=cart.pk)
+    with django_assert_num_queries(0):
+        assert fresh.summary() == summary
+
+
+def test_summary_deltas_add_up_to_the_aggregate(cart, product_factory):
+    # 0.6633 per unit: rounding each delta would drift to 1.98
+    p = product_factory(stock=10, price=Decimal("0.99"), discount_percent=Decimal("33"))
+    cart.summary()
+    for _ in range(3):
+        cart.add_product(p, 1)
+
+    assert cart.summary()["subtotal"] == Decimal("1.99")
+    assert Cart.objects.get(pk=cart.pk).summary() == cart.summary()
+    cart.invalidate_summary()
+    assert cart.summary()["subtotal"] == Decimal("1.99")
+
+
+def test_summary_is_invalidated_by_mutations(cart, product_factory):
+    p = product_factory(stock=10, price=Decimal("10.00"))
+    assert cart.summary()["total_quantity"] == 0
+    cart.add_product(p, 2)
+    assert cart.summary()["total_quantity"] == 2
+    cart.set_product_quantity(p, 5)
+    assert cart.summary() == {"total_quantity": 5, "subtotal": Decimal("50.00")}
+    cart.clear()
+    assert cart.summary()["total_quantity"] == 0
+
+
+def test_summary_follows_price_and_discount_changes(cart, product_factory):
+    p = product_factory(stock=10, price=Decimal("10.00"))
+    cart.add_product(p, 2)
+    assert Cart.objects.get(pk=cart.pk).summary()["subtotal"] == Decimal("20.00")
+
+    p.price = Decimal("20.00")
+    p.save()
+    assert Cart.objects.get(pk=cart.pk).summary()["subtotal"] == Decimal("40.00")
+
+    p.discount_percent = Decimal("25")
+    p.save()
+    assert Cart.objects.get(pk=cart.pk).summary()["subtotal"] == Decimal("30.00")
+
+
+def test_anonymous_page_view_creates_no_session_or_cart(client, product):
+    r = client.get(reverse("products:index"))
+    assert r.status_code == 200
+    assert r.context["cart_total_quantity"] == 0
+    assert not Cart.objects.exists()
+    assert "sessionid" not in client.cookies
+
+
+# --- Lazy / read-only lookup tests ---
+
+
+def test_get_for_request_without_create_is_read_only(rf, user):
+    from django.contrib.auth.models import AnonymousUser
+    from django.contrib.sessions.backends.db import SessionStore
+
+    request = rf.get("/")
+    request.user = AnonymousUser()
+    request.session = SessionStore()
+    assert Cart.get_for_request(request) is None
+    assert request.session.session_key is None
+
+    request.user = user
+    assert Cart.get_for_request(request) is None
+    assert not Cart.objects.exists()
+
+
+def test_cart_pages_do_not_create_cart_until_first_add(client, product_factory):
+    p = product_factory(stock=5, price=Decimal("10.00"))
+
+    assert client.get(reverse("cart:detail")).status_code == 200
+    client.post(reverse("cart:clear"))
+    client.post(reverse("cart:remove", args=[p.id]))
+    assert not Cart.objects.exists()
+
+    client.post(reverse("cart:add", args=[p.id]), {"quantity": 2})
+    cart = Cart.objects.get(session_key=client.session.session_key)
+    r = client.get(reverse("cart:detail"))
+    assert r.context["cart"] == cart
+    assert r.context["cart_total_quantity"] == 2
+
+
+# --- Batch endpoint ---
+
+
+def post_batch(client, operations):
+    return client.post(
+        reverse("cart:batch"),
+        json.dumps({"operations": operations}),
+        content_type="application/json",
+    )
+
+
+def test_batch_applies_operations_and_returns_totals(client, product_factory):
+    p1 = product_factory(stock=10, price=Decimal("10.00"))
+    p2 = product_factory(stock=10, price=Decimal("5.00"))
+    p3 = product_factory(stock=10, price=Decimal("1.00"))
+
+    r = post_batch(
+        client,
+        [
+            {"product_id": p1.id, "op": "add", "quantity": 2},
+            {"product_id": p2.id, "op": "set", "quantity": 4},
+            {"product_id": p3.id, "op": "add", "quantity": 1},
+            {"product_id": p3.id, "op": "remove"},
+        ],
+    )
+
+    assert r.status_code == 200
+    data = r.json()
+    assert data["ok"] is True
+    assert [res["quantity"] for res in data["results"]] == [2, 4, 1, 0]
+    assert data["total_quantity"] == 6
+    assert Decimal(data["subtotal"]) == Decimal("40.00")
+
+
+def test_batch_reports_rejected_lines_and_applies_the_rest(client, product_factory):
+    p = product_factory(stock=2)
+    ok = product_factory(stock=10)
+
+    r = post_batch(
+        client,
+        [
+            {"product_id": p.id, "op": "add", "quantity": 5},
+            {"product_id": 999999, "op": "add"},
+            {"product_id": ok.id, "op": "explode"},
+            {"product_id": ok.id, "op": "add", "quantity": 3},
+        ],
+    )
+
+    data = r.json()
+    assert data["ok"] is False
+    assert [res["ok"] for res in data["results"]] == [False, False, False, True]
+    assert "Only 2 available" in data["results"][0]["message"]
+    assert data["results"][1]["message"] == "Product not found"
+    assert data["total_quantity"] == 3
+
+
+def test_batch_loads_products_in_one_query(client, product_factory):
+    products = [product_factory(stock=10) for _ in range(5)]
+    post_batch(client, [{"product_id": products[0].id, "op": "add"}])  # create the cart
+
+    with CaptureQueriesContext(connection) as ctx:
+        post_batch(client, [{"product_id": p.id, "op": "add"} for p in products])
+
+    product_selects = [
+        q for q in ctx.captured_queries if 'FROM "products_product"' in q["sql"]
+    ]
+    assert len(product_selects) == 1
+
+
+@pytest.mark.parametrize("body", ["not json", "[]", '{"operations": {}}'])
+def test_batch_rejects_malformed_body(client, body):
+    r = client.post(reverse("cart:batch"), body, content_type="application/json")
+    assert r.status_code == 400
+    assert r.json()["ok"] is False
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+
+pytestmark = pytest.mark.django_db
+
+
+def make_cart(product, age_days, **fields):
+    cart = Cart.objects.create(**fields)
+    CartItem.objects.create(cart=cart, product=product, quantity=1)
+    Cart.objects.filter(pk=cart.pk).update(
+        updated_at=timezone.now() - timedelta(days=age_days)
+    )
+    return cart
+
+
+def purge(*args):
+    out = StringIO()
+    call_command("purge_carts", "--older-than-days", "14", *args, stdout=out)
+    return out.getvalue()
+
+
+def test_purges_old_anonymous_carts_in_batches(product):
+    old = [make_cart(product, 30, session_key=f"gone-{n}") for n in range(5)]
+    recent = make_cart(product, 1, session_key="recent")
+
+    output = purge("--batch-size", "2")
+
+    assert "Deleted 5 carts and 5 items in 3 batches" in output
+    assert "carts/s" in output
+    assert list(Cart.objects.all()) == [recent]
+    assert not CartItem.objects.filter(cart_id__in=[c.pk for c in old]).exists()
+
+
+def test_batch_revived_meanwhile_does_not_stop_the_purge(product, monkeypatch):
+    old = [make_cart(product, 30 - n, session_key=f"gone-{n}") for n in range(5)]
+    abandoned = Cart.abandoned
+    calls = []
+
+    def revive_first_batch(cutoff):
+        calls.append(cutoff)
+        if len(calls) == 2:  # the DELETE re-check of the first batch
+            Cart.objects.filter(pk__in=[old[0].pk, old[1].pk]).update(
+                updated_at=timezone.now()
+            )
+        return abandoned(cutoff)
+
+    monkeypatch.setattr(Cart, "abandoned", revive_first_batch)
+
+    assert "Deleted 3 carts and 3 items in 3 batches" in purge("--batch-size", "2")
+    assert set(Cart.objects.all()) == {old[0], old[1]}
+
+
+def test_keeps_user_carts_and_carts_with_live_sessions(user, product):
+    session = SessionStore()
+    session.create()
+    alive = make_cart(product, 30, session_key=session.session_key)
+    owned = make_cart(product, 30, user=user)
+
+    assert "Deleted 0 carts" in purge()
+    assert set(Cart.objects.all()) == {alive, owned}
+
+
+def test_dry_run_only_counts(product):
+    make_cart(product, 30, session_key="gone")
+
+    assert "Would delete 1 carts and 1 items" in purge("--dry-run")
+    assert Cart.objects.count() == 1
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from cart.models import Cart, CartItem
+from cart.session import SessionCart
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def session_storage(settings):
+    settings.CART_STORAGE = "session"
+
+
+def test_anonymous_cart_lives_in_session_only(client, ajax, product_factory):
+    p = product_factory(stock=10, price=Decimal("12.50"))
+
+    r = ajax(reverse("cart:add", args=[p.id]), {"quantity": 2})
+
+    assert r.status_code == 200
+    assert r.json()["total_quantity"] == 2
+    assert Decimal(r.json()["subtotal"]) == Decimal("25.00")
+    assert client.session[SessionCart.SESSION_KEY] == {str(p.id): 2}
+    assert not Cart.objects.exists()
+    assert not CartItem.objects.exists()
+
+
+def test_session_cart_enforces_the_same_limits(ajax, product_factory):
+    p = product_factory(stock=3)
+    url = reverse("cart:add", args=[p.id])
+    ajax(url, {"quantity": 2})
+
+    r = ajax(url, {"quantity": 2})
+
+    assert r.status_code == 400
+    assert "Only 3 available" in r.json()["message"]
+
+
+def test_session_cart_set_remove_and_detail_page(client, product_factory):
+    keep = product_factory(stock=10, name="Keep")
+    drop = product_factory(stock=10, name="Drop")
+    client.post(reverse("cart:add", args=[keep.id]), {"quantity": 1})
+    client.post(reverse("cart:add", args=[drop.id]), {"quantity": 1})
+
+    client.post(reverse("cart:set", args=[keep.id]), {"quantity": 100})
+    client.post(reverse("cart:remove", args=[drop.id]))
+
+    r = client.get(reverse("cart:detail"))
+    assert [(i.product, i.quantity) for i in r.context["cart_items"]] == [(keep, 10)]
+    assert r.context["cart_total_items"] == 10
+
+
+def test_empty_session_cart_is_not_created_by_page_views(client, product):
+    client.get(reverse("products:index"))
+    client.get(reverse("cart:detail"))
+    assert SessionCart.SESSION_KEY not in client.session
+
+
+def test_session_cart_is_written_to_database_on_login(client, user, product_factory):
+    p1, p2 = product_factory(stock=10), product_factory(stock=2)
+    client.post(reverse("cart:add", args=[p1.id]), {"quantity": 3})
+    client.post(reverse("cart:add", args=[p2.id]), {"quantity": 2})
+    user_cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=user_cart, product=p2, quantity=1)
+
+    user.set_password("pw-12345")
+    user.save()
+    assert client.login(email=user.email, password="pw-12345")
+    client.get(reverse("cart:detail"))
+
+    quantities = dict(user_cart.cart_items.values_list("product_id", "quantity"))
+    assert quantities == {p1.id: 3, p2.id: 2}  # p2 clamped to stock
+    assert SessionCart.SESSION_KEY not in client.session
@@ -10,4 +10,5 @@ urlpatterns = [
     path("remove/<int:product_id>/", views.RemoveFromCartView.as_view(), name="remove"),
     path("set/<int:product_id>/", views.SetQuantityView.as_view(), name="set"),
     path("clear/", views.ClearCartView.as_view(), name="clear"),
+    path("batch/", views.BatchCartView.as_view(), name="batch"),
 ]
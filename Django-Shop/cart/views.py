@@ -1,10 +1,14 @@
+import json
+
 from django.contrib import messages
+from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView, View
 
+from orders.models import StockReservation
 from products.models import Product
 
 from .exceptions import CartError
@@ -16,35 +20,57 @@ class CartDetailView(TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["cart"] = Cart.get_or_create_for_request(self.request)
+        cart = ctx["cart"] = Cart.get_for_request(self.request)
+        # Evaluate the lines once; the template loops over them and sums them
+        items = ctx["cart_items"] = list(cart.items) if cart else []
+        ctx["cart_total_items"] = sum(item.quantity for item in items)
+        ctx["cart_total"] = sum(item.line_subtotal for item in items)
         return ctx
 
 
 @method_decorator(require_POST, name="dispatch")
 class CartActionMixin(View):
-    """Shared logic for cart-mutating POST views."""
+    """Shared logic for cart-mutating POST views.
+
+    The session and cart row are only created by views that can add items
+    (``create_cart = True``); removing from or clearing a missing cart is a no-op.
+    """
+
+    create_cart = True
 
     def dispatch(self, request, *args, **kwargs):
-        self.cart = Cart.get_or_create_for_request(request)
+        self.cart = Cart.get_for_request(request, create=self.create_cart)
         return super().dispatch(request, *args, **kwargs)
 
-    def respond(self, message, *, ok=True):
-        """Return JSON for AJAX requests, or HTML redirect for POST requests."""
+    def respond(self, message, *, ok=True, item=None):
+        """Return JSON for AJAX requests, or HTML redirect for POST requests.
+
+        ``item`` (the affected cart line) is included in the JSON payload.
+        """
 
         # Check if the request wants JSON (AJAX detected via X-Requested-With)
         wants_json = (
             self.request.headers.get("X-Requested-With", "").lower() == "xmlhttprequest"
         )
         if wants_json:
-            return JsonResponse(
-                {
-                    "ok": ok,
-                    "message": message,
-                    "total_quantity": self.cart.total_quantity,
-                    "subtotal": str(self.cart.subtotal),
-                },
-                status=400 if not ok else 200,
+            summary = (
+                self.cart.summary()
+                if self.cart
+                else {"total_quantity": 0, "subtotal": 0}
             )
+            payload = {
+                "ok": ok,
+                "message": message,
+                "total_quantity": summary["total_quantity"],
+                "subtotal": str(summary["subtotal"]),
+            }
+            if item is not None:
+                payload["line"] = {
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "line_subtotal": str(item.line_subtotal),
+                }
+            return JsonResponse(payload, status=400 if not ok else 200)
 
         if ok:
             messages.success(self.request, message)
@@ -53,31 +79,39 @@ class CartActionMixin(View):
         return redirect("cart:detail")
 
 
+def get_product_for_cart(product_id):
+    """The product with its ``available_stock`` annotated (one query)."""
+    return get_object_or_404(
+        StockReservation.with_available_stock(Product.objects.all()), pk=product_id
+    )
+
+
 class AddToCartView(CartActionMixin):
     def post(self, request, product_id):
-        product = get_object_or_404(
-            Product.objects.select_related("category"), pk=product_id
-        )
+        product = get_product_for_cart(product_id)
 
         try:
             quantity = self.cart._parse_quantity(request.POST.get("quantity", 1))
             item, info = self.cart.add_product(product, quantity)
             message = f"Added {info['added_quantity']} × {product.name} to cart."
-            return self.respond(message)
+            return self.respond(message, item=item)
         except CartError as e:
             return self.respond(str(e), ok=False)
 
 
 class RemoveFromCartView(CartActionMixin):
+    create_cart = False
+
     def post(self, request, product_id):
         product = get_object_or_404(Product, pk=product_id)
-        self.cart.remove_product(product)
+        if self.cart:
+            self.cart.remove_product(product)
         return self.respond(f"Removed {product.name} from cart")
 
 
 class SetQuantityView(CartActionMixin):
     def post(self, request, product_id):
-        product = get_object_or_404(Product, pk=product_id)
+        product = get_product_for_cart(product_id)
 
         try:
             quantity = self.cart._parse_quantity(
@@ -94,6 +128,91 @@ class SetQuantityView(CartActionMixin):
 
 
 class ClearCartView(CartActionMixin):
+    create_cart = False
+
     def post(self, request):
-        self.cart.clear()
+        if self.cart:
+            self.cart.clear()
         return self.respond("Cart cleared")
+
+
+class BatchCartView(CartActionMixin):
+    """Apply several cart changes in one request (quantity steppers, reorder).
+
+    Expects a JSON body ``{"operations": [{"product_id", "op", "quantity"}]}``
+    where ``op`` is ``add``, ``set`` or ``remove``. All products are loaded in
+    one query and the operations run in one transaction; each one is validated
+    like its single-item view, so a rejected line does not stop the others.
+    Responds with a result per operation plus the cart totals.
+    """
+
+    MAX_OPERATIONS = 50
+
+    def post(self, request):
+        try:
+            operations = json.loads(request.body)["operations"]
+            if not isinstance(operations, list) or not all(
+                isinstance(op, dict) for op in operations
+            ):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse(
+                {"ok": False, "message": 'Expected {"operations": [...]}'},
+                status=400,
+            )
+        if len(operations) > self.MAX_OPERATIONS:
+            return JsonResponse(
+                {
+                    "ok": False,
+                    "message": f"At most {self.MAX_OPERATIONS} operations per batch",
+                },
+                status=400,
+            )
+
+        products = StockReservation.with_available_stock(Product.objects.all()).in_bulk(
+            {self.product_id(op) for op in operations} - {None}
+        )
+
+        with transaction.atomic():
+            results = [self.apply(op, products) for op in operations]
+
+        summary = self.cart.summary()
+        return JsonResponse(
+            {
+                "ok": all(result["ok"] for result in results),
+                "results": results,
+                "total_quantity": summary["total_quantity"],
+                "subtotal": str(summary["subtotal"]),
+            }
+        )
+
+    @staticmethod
+    def product_id(op):
+        try:
+            return int(op.get("product_id"))
+        except (TypeError, ValueError):
+            return None
+
+    def apply(self, op, products):
+        """Run one operation; returns its result entry."""
+        name = op.get("op")
+        result = {"product_id": op.get("product_id"), "op": name, "ok": True}
+        product = products.get(self.product_id(op))
+        if product is None:
+            return {**result, "ok": False, "message": "Product not found"}
+
+        try:
+            if name == "add":
+                quantity = self.cart._parse_quantity(op.get("quantity", 1))
+                item, _ = self.cart.add_product(product, quantity)
+            elif name == "set":
+                quantity = self.cart._parse_quantity(op.get("quantity", 0), default=0)
+                item, _ = self.cart.set_product_quantity(product, quantity)
+            elif name == "remove":
+                self.cart.remove_product(product)
+                item = None
+            else:
+                return {**result, "ok": False, "message": f"Unknown operation {name!r}"}
+        except CartError as e:
+            return {**result, "ok": False, "message": str(e)}
+        return {**result, "quantity": item.quantity if item else 0}
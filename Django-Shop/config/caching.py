@@ -0,0 +1,102 @@
+"""Cached computations that are refreshed by one caller at a time.
+
+A plain ``cache.get``/``cache.set`` pair lets every concurrent request
+recompute an expensive value the moment its key expires. ``cached_computation``
+keeps each value for ``stale_ttl`` seconds past its freshness instead: the
+first caller to see it stale takes a short lock (``cache.add`` of a unique
+token, released only by its holder) and recomputes, while everyone else keeps
+getting the stale value. Only a cold key makes callers wait, briefly, for the
+one computing it.
+
+Cache plain data (ids, rows, numbers) rather than model instances, so cached
+entries stay small and prices or stock are read fresh from the database.
+"""
+
+import time
+import uuid
+
+from django.core.cache import cache
+
+LOCK_KEY = "{key}:lock"
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+def cached_computation(key, compute, timeout, *, stale_ttl=None, wait=2.0):
+    """Return ``compute()``, cached under ``key`` for ``timeout`` seconds.
+
+    Stale values are served for up to ``stale_ttl`` more seconds (default:
+    ``timeout``) while one caller refreshes them. On a cold key, callers that
+    did not get the lock poll for up to ``wait`` seconds, then compute the
+    value themselves without storing it.
+    """
+    stale_ttl = timeout if stale_ttl is None else stale_ttl
+    entry = cache.get(key)
+    if entry is not None:
+        fresh_until, value = entry
+        if time.time() < fresh_until:
+            return value
+        token = _lock(key)
+        if token is None:
+            return value
+        return _refresh(key, compute, timeout, stale_ttl, token)
+
+    deadline = time.monotonic() + wait
+    while (token := _lock(key)) is None:
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+    return _refresh(key, compute, timeout, stale_ttl, token)
+
+
+def update_cached_computation(key, update, timeout, *, stale_ttl=None):
+    """Replace the value cached under ``key`` with ``update(value)``.
+
+    For callers that know how a change shifts the value and want to skip the
+    recomputation. The entry keeps its freshness; ``timeout`` and
+    ``stale_ttl`` must match the ``cached_computation`` call. The update runs
+    under the refresh lock, so concurrent updates cannot overwrite each
+    other; when the lock is taken the entry is dropped instead. Returns the
+    new value, or None when nothing was cached.
+    """
+    stale_ttl = timeout if stale_ttl is None else stale_ttl
+    token = _lock(key)
+    if token is None:
+        cache.delete(key)
+        return None
+    try:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        fresh_until, value = entry
+        value = update(value)
+        expires_in = max(fresh_until - time.time(), 0) + stale_ttl
+        cache.set(key, (fresh_until, value), expires_in)
+        return value
+    finally:
+        _unlock(key, token)
+
+
+def _lock(key):
+    """Take the refresh lock of ``key``; returns its token, None if taken."""
+    token = uuid.uuid4().hex
+    return token if cache.add(LOCK_KEY.format(key=key), token, LOCK_TIMEOUT) else None
+
+
+def _unlock(key, token):
+    # A refresh that outlived LOCK_TIMEOUT must not free another caller's lock
+    lock_key = LOCK_KEY.format(key=key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _refresh(key, compute, timeout, stale_ttl, token):
+    try:
+        value = compute()
+        cache.set(key, (time.time() + timeout, value), timeout + stale_ttl)
+        return value
+    finally:
+        _unlock(key, token)
@@ -0,0 +1,99 @@
+"""Per-request SQL instrumentation.
+
+``QueryRecorder`` is installed with ``connection.execute_wrapper`` and counts
+every query a request runs, the time spent in the database and repeated
+statements (the usual sign of an N+1 loop). ``QueryCountMiddleware`` reports
+those numbers in a ``Server-Timing`` header when DEBUG is on, and logs them
+otherwise. The ``query_budget`` pytest fixture uses the same recorder.
+"""
+
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Execute wrapper collecting query count, SQL time and statement repeats.
+
+    Queries are fingerprinted by their parametrised SQL, so the same statement
+    run for every row of a list shows up as one fingerprint with a high count.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds
+        self.fingerprints = Counter()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+            self.fingerprints[sql] += 1
+            self.queries.append(sql)
+
+    @property
+    def duplicates(self):
+        """Fingerprints run more than once, mapped to how often they ran."""
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+    @property
+    def duplicate_count(self):
+        """Queries that repeated an earlier statement."""
+        return sum(n - 1 for n in self.duplicates.values())
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries", '
+            f'db-dup;desc="{self.duplicate_count} duplicates"'
+        )
+
+
+class QueryCountMiddleware:
+    """Record the queries of each request (``Server-Timing`` in DEBUG, else logs).
+
+    Requests above ``QUERY_COUNT_WARNING`` queries are logged as warnings,
+    together with their most repeated statements.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            response["Server-Timing"] = recorder.server_timing()
+        else:
+            self.log(request, response, recorder)
+        return response
+
+    def log(self, request, response, recorder):
+        threshold = getattr(settings, "QUERY_COUNT_WARNING", None)
+        over_budget = threshold is not None and recorder.count > threshold
+        level = logging.WARNING if over_budget else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+
+        top = Counter(recorder.duplicates).most_common(3)
+        logger.log(
+            level,
+            "%s %s -> %s: %d queries, %.1f ms, %d duplicates%s",
+            request.method,
+            request.path,
+            response.status_code,
+            recorder.count,
+            recorder.duration * 1000,
+            recorder.duplicate_count,
+            "".join(f"\n  {n}x {sql}" for sql, n in top) if over_budget else "",
+        )
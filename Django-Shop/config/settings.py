@@ -63,9 +63,12 @@ INSTALLED_APPS = [
     "support",
     "careers",
     "cart",
+    "jobs",
 ]
 
 MIDDLEWARE = [
+    # First, so session/auth/message queries are counted too
+    "config.middleware.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -106,6 +109,7 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "products.context_processors.categories.categories_processor",
                 "cart.context_processors.cart_summary",
+                "products.context_processors.page_cache.page_cache_processor",
             ],
         },
     },
@@ -137,6 +141,17 @@ DATABASES = {
     }
 }
 
+# PostgreSQL when POSTGRES_DB is set (the CI runs the test suite on both)
+if os.getenv("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB"),
+        "USER": os.getenv("POSTGRES_USER", ""),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+        "HOST": os.getenv("POSTGRES_HOST", ""),
+        "PORT": os.getenv("POSTGRES_PORT", ""),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -189,6 +204,43 @@ AUTH_USER_MODEL = "users.CustomUser"
 # Cart settings
 # Maximum quantity allowed per single cart line item to avoid abuse / overflow.
 CART_MAX_ITEM_QTY = 50
+# Where anonymous carts live: "db" (Cart rows keyed by session) or "session"
+# (a {product_id: qty} map in the session, see cart.session.SessionCart, written
+# to the database only when the shopper logs in). Pair "session" with a cache or
+# signed-cookie SESSION_ENGINE to keep anonymous browsing free of database writes.
+CART_STORAGE = os.getenv("CART_STORAGE", "db")
+
+# Stock reservations (orders.models.StockReservation)
+# Checkout holds the ordered stock for this many seconds; the
+# release_expired_reservations command hands expired holds back.
+STOCK_RESERVATION_TTL = 15 * 60
+# Unreserved stock of each product is split across this many counter rows, so
+# concurrent checkouts of the same product update different rows.
+STOCK_RESERVATION_SHARDS = 8
+# Anonymous home, product list and product detail pages are cached whole for this
+# many seconds (0 disables); catalog changes invalidate them right away.
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "300"))
+# The home page lists the best sellers of this many days (ProductSalesStats).
+BEST_SELLERS_DAYS = 7
+
+# Background jobs (jobs app, run by `manage.py run_jobs`)
+# Failed jobs are retried after JOBS_BACKOFF_BASE * 2**(attempt - 1) seconds (capped at
+# JOBS_BACKOFF_MAX), up to JOBS_MAX_ATTEMPTS runs; jobs running for longer than
+# JOBS_STALE_AFTER seconds are assumed lost with their worker and queued again.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 10
+JOBS_BACKOFF_MAX = 60 * 60
+JOBS_STALE_AFTER = 10 * 60
+
+# Product search
+# Dotted path to a products.search backend; None picks one from the database vendor
+# (SQLite FTS5, PostgreSQL tsvector, or a plain icontains fallback).
+PRODUCT_SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND") or None
+
+# Query instrumentation (config.middleware.QueryCountMiddleware)
+# Requests running more queries than this are logged as warnings (production only;
+# with DEBUG the numbers go to the Server-Timing header instead).
+QUERY_COUNT_WARNING = int(os.getenv("QUERY_COUNT_WARNING", "30"))
 
 # allauth settings
 ACCOUNT_USER_MODEL_USERNAME_FIELD = None
@@ -216,9 +268,10 @@ PAYMENT_MODEL = "orders.Payment"
 PAYMENT_HOST = os.getenv("PAYMENT_HOST", "127.0.0.1:8000")
 
 # Development configuration
+# orders.providers.StripeProvider is StripeProviderV3 that drops retried webhook events
 PAYMENT_VARIANTS = {
     "stripe": (
-        "payments.stripe.StripeProviderV3",
+        "orders.providers.StripeProvider",
         {
             "api_key": os.getenv("STRIPE_API_KEY", "sk_test_123456"),
             "use_token": True,
@@ -232,7 +285,7 @@ PAYMENT_VARIANTS = {
 # Production configuration
 # PAYMENT_VARIANTS = {
 #     "stripe": (
-#         "payments.stripe.StripeProviderV3",
+#         "orders.providers.StripeProvider",
 #         {
 #             "api_key": os.getenv("STRIPE_API_KEY", ""),  # live or test key via env
 #             "use_token": True,
@@ -0,0 +1,128 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from model_bakery import baker
+
+from config import caching
+from config.caching import LOCK_KEY, cached_computation, update_cached_computation
+from products.models import Product
+
+
+class Counter:
+    def __init__(self, value="fresh"):
+        self.calls = 0
+        self.value = value
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable ``time.time`` for freshness checks."""
+    now = [1000.0]
+    monkeypatch.setattr(caching.time, "time", lambda: now[0])
+    return now
+
+
+def test_value_is_computed_once_while_fresh(clock):
+    compute = Counter()
+    assert cached_computation("k", compute, 60) == "fresh"
+    clock[0] += 59
+    assert cached_computation("k", compute, 60) == "fresh"
+    assert compute.calls == 1
+
+
+def test_stale_value_is_refreshed_by_the_lock_holder(clock):
+    cached_computation("k", Counter("old"), 60)
+    clock[0] += 61
+
+    assert cached_computation("k", Counter("new"), 60) == "new"
+    assert cache.get(LOCK_KEY.format(key="k")) is None
+
+
+def test_stale_value_is_served_while_another_caller_refreshes(clock):
+    cached_computation("k", Counter("old"), 60)
+    clock[0] += 61
+    cache.add(LOCK_KEY.format(key="k"), True)  # someone else is refreshing
+    compute = Counter("new")
+
+    assert cached_computation("k", compute, 60) == "old"
+    assert compute.calls == 0
+
+
+def test_cold_key_waits_for_the_caller_computing_it(monkeypatch):
+    cache.add(LOCK_KEY.format(key="k"), True)
+
+    def finish_elsewhere(seconds):
+        cache.set("k", (float("inf"), "theirs"))
+
+    monkeypatch.setattr(caching.time, "sleep", finish_elsewhere)
+    compute = Counter("mine")
+
+    assert cached_computation("k", compute, 60) == "theirs"
+    assert compute.calls == 0
+
+
+def test_cold_key_is_computed_without_storing_when_the_wait_runs_out():
+    cache.add(LOCK_KEY.format(key="k"), True)
+
+    assert cached_computation("k", Counter("mine"), 60, wait=0) == "mine"
+    assert cache.get("k") is None
+
+
+def test_lock_is_released_when_computing_fails():
+    def broken():
+        raise RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        cached_computation("k", broken, 60)
+    assert cached_computation("k", Counter(), 60) == "fresh"
+
+
+def test_slow_refresh_leaves_a_lock_taken_over_by_another_caller(clock):
+    lock_key = LOCK_KEY.format(key="k")
+
+    def slow():
+        # Our lock expired mid-refresh and another caller took it
+        cache.set(lock_key, "theirs")
+        return "slow"
+
+    assert cached_computation("k", slow, 60) == "slow"
+    assert cache.get(lock_key) == "theirs"
+
+
+def test_update_replaces_the_cached_value_keeping_its_freshness(clock):
+    cached_computation("k", Counter(1), 60)
+    clock[0] += 30
+
+    assert update_cached_computation("k", lambda value: value + 1, 60) == 2
+    clock[0] += 29
+    assert cached_computation("k", Counter(), 60) == 2
+
+
+def test_update_drops_the_value_while_it_is_being_refreshed(clock):
+    cached_computation("k", Counter(1), 60)
+    cache.add(LOCK_KEY.format(key="k"), True)
+
+    assert update_cached_computation("k", lambda value: value + 1, 60) is None
+    assert cache.get("k") is None
+
+
+def test_update_of_a_cold_key_stores_nothing():
+    assert update_cached_computation("k", lambda value: value + 1, 60) is None
+    assert cache.get("k") is None
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("no_page_cache")
+def test_home_page_caches_ids_and_shows_current_prices(client):
+    product = baker.make(Product, is_available=True, discount_percent=10, price=20)
+    client.get(reverse("home:index"))
+    assert cache.get("home:special-discount-ids")[1] == [product.pk]
+
+    Product.objects.filter(pk=product.pk).update(price=30)
+    response = client.get(reverse("home:index"))
+
+    assert [p.price for p in response.context["special_discounts"]] == [30]
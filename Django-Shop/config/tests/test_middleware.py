@@ -0,0 +1,53 @@
+import logging
+
+import pytest
+from django.urls import reverse
+
+from config.middleware import QueryRecorder
+
+pytestmark = pytest.mark.django_db
+
+
+def test_server_timing_header_in_debug(client, product, settings):
+    settings.DEBUG = True
+    response = client.get(reverse("products:index"))
+    assert response["Server-Timing"].startswith("db;dur=")
+    assert "queries" in response["Server-Timing"]
+
+
+def test_queries_are_logged_without_debug(client, product, settings, caplog):
+    settings.DEBUG = False
+    settings.QUERY_COUNT_WARNING = 0
+    with caplog.at_level(logging.INFO, logger="config.middleware"):
+        response = client.get(reverse("products:index"))
+
+    assert "Server-Timing" not in response
+    (record,) = caplog.records
+    assert record.levelno == logging.WARNING
+    assert record.getMessage().startswith("GET /products/ -> 200:")
+
+
+def test_recorder_fingerprints_repeated_statements(product_factory, query_budget):
+    products = [product_factory() for _ in range(3)]
+    with query_budget(10) as recorder:
+        for product in products:
+            product.images.count()  # the same statement once per product
+
+    assert recorder.count == 3
+    assert recorder.duplicate_count == 2
+    assert list(recorder.duplicates.values()) == [3]
+
+
+def test_query_budget_fails_when_exceeded(product, query_budget):
+    with pytest.raises(pytest.fail.Exception, match="exceeded the budget of 1"):
+        with query_budget(1):
+            product.images.count()
+            product.reviews.count()
+
+
+def test_empty_recorder_server_timing():
+    recorder = QueryRecorder()
+    assert (
+        recorder.server_timing()
+        == 'db;dur=0.0;desc="0 queries", db-dup;desc="0 duplicates"'
+    )
@@ -0,0 +1,97 @@
+"""Query budgets for the busiest pages and cart endpoints.
+
+Each page is rendered once to warm process-level caches (category tree,
+cart summary), then measured, with the anonymous page cache turned off.
+Budgets are exact upper bounds taken from the current implementation: raise
+one only with a reason, lower it when a view gets cheaper.
+"""
+
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+
+from orders.models import Order, OrderItem
+from products.models import ProductImage, Review
+from users.models import Wishlist
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("no_page_cache")]
+
+
+@pytest.fixture
+def catalog(product_factory):
+    """A handful of products with images and reviews, so N+1 loops would show."""
+    products = [product_factory() for _ in range(6)]
+    for product in products:
+        baker.make(ProductImage, product=product, image="products/x.jpg")
+        baker.make(Review, product=product, rating=4, _quantity=2)
+    return products
+
+
+@pytest.fixture
+def shopper(client, user, catalog):
+    """A logged-in user with wishlist entries and a few past orders."""
+    client.force_login(user)
+    for product in catalog:
+        Wishlist.objects.create(user=user, product=product)
+    for order in baker.make(Order, user=user, _quantity=3):
+        for product in catalog[:3]:
+            baker.make(OrderItem, order=order, product=product, quantity=1, price=1)
+    return client
+
+
+def assert_within_budget(query_budget, max_queries, request):
+    request()  # warm caches
+    with query_budget(max_queries):
+        response = request()
+    assert response.status_code == 200
+    return response
+
+
+def test_product_list_budget(client, catalog, query_budget):
+    assert_within_budget(query_budget, 2, lambda: client.get(reverse("products:index")))
+
+
+def test_product_list_budget_logged_in(shopper, query_budget):
+    assert_within_budget(
+        query_budget, 6, lambda: shopper.get(reverse("products:index"))
+    )
+
+
+def test_product_detail_budget(shopper, catalog, query_budget):
+    url = reverse("products:product_detail", args=[catalog[0].slug])
+    assert_within_budget(query_budget, 9, lambda: shopper.get(url))
+
+
+def test_cart_detail_budget(shopper, catalog, ajax, query_budget):
+    for product in catalog:
+        ajax(reverse("cart:add", args=[product.id]), {"quantity": 1})
+    assert_within_budget(query_budget, 8, lambda: shopper.get(reverse("cart:detail")))
+
+
+def test_order_list_budget(shopper, query_budget):
+    assert_within_budget(
+        query_budget, 7, lambda: shopper.get(reverse("orders:order_list"))
+    )
+
+
+def test_home_page_budget(shopper, query_budget):
+    assert_within_budget(query_budget, 4, lambda: shopper.get(reverse("home:index")))
+
+
+# cart:set: session, user, cart lookup (2), product with available stock,
+# update_or_create (savepoint, locked read, UPDATE, release), summary aggregate.
+# The cart timestamp was bumped by the warm-up request (Cart.touch).
+@pytest.mark.parametrize(
+    "name, data, budget",
+    [
+        ("cart:add", {"quantity": 1}, 9),
+        ("cart:set", {"quantity": 2}, 10),
+        ("cart:remove", {}, 8),
+        ("cart:clear", {}, 7),
+    ],
+)
+def test_cart_endpoint_budgets(
+    shopper, catalog, ajax, query_budget, name, data, budget
+):
+    url = reverse(name, args=[catalog[0].id]) if name != "cart:clear" else reverse(name)
+    assert_within_budget(query_budget, budget, lambda: ajax(url, data))
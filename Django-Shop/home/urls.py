@@ -1,10 +1,12 @@
 from django.urls import path
 
+from products.page_cache import cache_anonymous_page
+
 from .views import AboutView, FAQView, HomePageView, PrivacyPolicyView
 
 app_name = "home"
 urlpatterns = [
-    path("", HomePageView.as_view(), name="index"),
+    path("", cache_anonymous_page(HomePageView.as_view()), name="index"),
     path("about/", AboutView.as_view(), name="about"),
     path("faq/", FAQView.as_view(), name="faq"),
     path("privacy/", PrivacyPolicyView.as_view(), name="privacy"),
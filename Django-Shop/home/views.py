@@ -1,8 +1,8 @@
-from django.core.cache import cache
-from django.db.models import Sum
+from django.conf import settings
 from django.views.generic import TemplateView
 
-from orders.models import OrderItem
+from config.caching import cached_computation
+from orders.models import ProductSalesStats
 from products.models import Product
 
 
@@ -12,32 +12,41 @@ class HomePageView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Special Discounts: cache for 10 minutes
-        special_discounts = cache.get("special_discounts")
-        if special_discounts is None:
-            special_discounts = list(
-                Product.objects.filter(
-                    is_available=True, discount_percent__gt=0
-                ).order_by("-discount_percent", "-updated_at")[:8]
-            )
-            cache.set("special_discounts", special_discounts, 600)
-        context["special_discounts"] = special_discounts
-
-        # Most Bought Products: cache for 10 minutes
-        most_bought_products = cache.get("most_bought_products")
-        if most_bought_products is None:
-            ids = (
-                OrderItem.objects.values("product")
-                .annotate(total_sold=Sum("quantity"))
-                .order_by("-total_sold")
-                .values_list("product", flat=True)[:8]
-            )
-            most_bought_products = list(Product.objects.filter(id__in=ids))
-            cache.set("most_bought_products", most_bought_products, 600)
-        context["most_bought_products"] = most_bought_products
+        # Product ids are cached for 10 minutes, the products themselves are
+        # loaded fresh (both lists in one query) so prices are never stale
+        discount_ids = cached_computation(
+            "home:special-discount-ids", self.special_discount_ids, 600
+        )
+        best_seller_ids = cached_computation(
+            "home:best-seller-ids", self.best_seller_ids, 600
+        )
+        products = Product.objects.with_card_data().in_bulk(
+            set(discount_ids) | set(best_seller_ids)
+        )
+        context["special_discounts"] = [
+            products[pk]
+            for pk in discount_ids
+            if pk in products and products[pk].is_available
+        ]
+        context["most_bought_products"] = [
+            products[pk] for pk in best_seller_ids if pk in products
+        ]
 
         return context
 
+    @staticmethod
+    def special_discount_ids():
+        return list(
+            Product.objects.filter(is_available=True, discount_percent__gt=0)
+            .order_by("-discount_percent", "-updated_at")
+            .values_list("pk", flat=True)[:8]
+        )
+
+    @staticmethod
+    def best_seller_ids():
+        """Best sellers of the last ``BEST_SELLERS_DAYS`` days."""
+        return ProductSalesStats.best_sellers(days=settings.BEST_SELLERS_DAYS, limit=8)
+
 
 class AboutView(TemplateView):
     template_name = "home/about/index.html"
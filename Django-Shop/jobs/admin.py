@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "last_error")
+    readonly_fields = ("created_at", "finished_at", "locked_at", "locked_by")
+    actions = ["retry"]
+
+    @admin.action(description="Queue selected jobs again")
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
+    verbose_name = "Background jobs"
+
+    def ready(self):
+        # Register the job functions declared in every app's tasks.py
+        autodiscover_modules("tasks")
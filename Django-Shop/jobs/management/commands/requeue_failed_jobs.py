@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Queue failed background jobs again (all of them, or only the given names)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Job names to requeue, e.g. orders.apply_payment_status",
+        )
+
+    def handle(self, *args, **options):
+        requeued = Job.requeue_failed(options["names"])
+        self.stdout.write(self.style.SUCCESS(f"Requeued {requeued} failed jobs."))
@@ -0,0 +1,46 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (polls the database job queue)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs that are due now, then exit",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Number of jobs claimed per transaction",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling again when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        total = 0
+        try:
+            while True:
+                Job.requeue_stale()
+                processed = Job.run_pending(options["batch_size"], worker)
+                total += processed
+                if options["once"]:
+                    break
+                if not processed:
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} jobs."))
@@ -0,0 +1,164 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .registry import get_job
+
+logger = logging.getLogger(__name__)
+
+
+class Job(models.Model):
+    """A unit of background work, queued in the database.
+
+    ``Job.enqueue`` writes a row in the caller's transaction, so a job is only
+    visible to workers once the work that produced it is committed. Workers
+    (``manage.py run_jobs``) claim due jobs, run them and retry failures with
+    exponential backoff until ``max_attempts`` is reached. Jobs that gave up
+    are logged as errors and stay FAILED until ``requeue_failed_jobs`` (or the
+    admin action) queues them again.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due jobs in run_at order
+            models.Index(fields=["status", "run_at"], name="job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, name, *, delay=0, max_attempts=None, **payload) -> "Job":
+        """Queue ``name`` to run with ``payload`` as keyword arguments."""
+        get_job(name)  # fail at enqueue time, not in the worker
+        return cls.objects.create(
+            name=name,
+            payload=payload,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        )
+
+    @classmethod
+    def claim(cls, batch_size=10, worker="") -> list:
+        """Mark up to ``batch_size`` due jobs as running for this worker.
+
+        Rows locked by another worker's claim are skipped rather than waited for.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            due = (
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(status=cls.QUEUED, run_at__lte=now)
+                .order_by("run_at", "pk")
+            )
+            jobs = list(due[:batch_size])
+            for job in jobs:
+                job.status = cls.RUNNING
+                job.attempts += 1
+                job.locked_at = now
+                job.locked_by = worker
+            cls.objects.bulk_update(
+                jobs, ["status", "attempts", "locked_at", "locked_by"]
+            )
+        return jobs
+
+    def run(self) -> bool:
+        """Run a claimed job; returns whether it succeeded."""
+        try:
+            get_job(self.name)(**self.payload)
+        except Exception:
+            self.failed(traceback.format_exc())
+            return False
+        self.status = self.DONE
+        self.finished_at = timezone.now()
+        self.last_error = ""
+        self.save(update_fields=["status", "finished_at", "last_error"])
+        return True
+
+    def failed(self, error):
+        """Schedule a retry after ``backoff`` or give up after ``max_attempts``."""
+        self.last_error = error
+        self.locked_at = None
+        if self.attempts >= self.max_attempts:
+            self.status = self.FAILED
+            self.finished_at = timezone.now()
+            logger.error(
+                "Job %s failed permanently after %d attempts:\n%s",
+                self,
+                self.attempts,
+                error,
+            )
+        else:
+            self.status = self.QUEUED
+            self.run_at = timezone.now() + self.backoff(self.attempts)
+        self.save(
+            update_fields=["status", "run_at", "locked_at", "finished_at", "last_error"]
+        )
+
+    @staticmethod
+    def backoff(attempts) -> timedelta:
+        """Exponential delay before retry ``attempts + 1``, with 10% jitter."""
+        delay = min(
+            settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1), settings.JOBS_BACKOFF_MAX
+        )
+        return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+    @classmethod
+    def run_pending(cls, batch_size=10, worker="inline", limit=None) -> int:
+        """Run due jobs until none are left (or ``limit`` ran); returns the count."""
+        processed = 0
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            jobs = cls.claim(size, worker)
+            if not jobs:
+                break
+            for job in jobs:
+                job.run()
+            processed += len(jobs)
+        return processed
+
+    @classmethod
+    def requeue_stale(cls, older_than=None) -> int:
+        """Put back jobs left running by a worker that died."""
+        older_than = older_than or timedelta(seconds=settings.JOBS_STALE_AFTER)
+        return cls.objects.filter(
+            status=cls.RUNNING, locked_at__lt=timezone.now() - older_than
+        ).update(status=cls.QUEUED, locked_at=None, locked_by="")
+
+    @classmethod
+    def requeue_failed(cls, names=()) -> int:
+        """Queue jobs that gave up again, with a fresh set of attempts."""
+        failed = cls.objects.filter(status=cls.FAILED)
+        if names:
+            failed = failed.filter(name__in=names)
+        return failed.update(
+            status=cls.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None
+        )
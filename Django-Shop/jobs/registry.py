@@ -0,0 +1,31 @@
+"""Names of the functions the job queue may run.
+
+Apps declare jobs in a ``tasks.py`` module (imported by ``JobsConfig.ready``)::
+
+    @job("orders.apply_payment_status")
+    def apply_payment_status(payment_id, status): ...
+
+Jobs receive the JSON payload they were enqueued with as keyword arguments,
+so they should take ids rather than model instances.
+"""
+
+_jobs = {}
+
+
+def job(name):
+    """Register the decorated function as the job called ``name``."""
+
+    def register(func):
+        if _jobs.get(name, func) is not func:
+            raise ValueError(f"Job {name!r} is already registered")
+        _jobs[name] = func
+        return func
+
+    return register
+
+
+def get_job(name):
+    try:
+        return _jobs[name]
+    except KeyError:
+        raise LookupError(f"No job registered as {name!r}") from None
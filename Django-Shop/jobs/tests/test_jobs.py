@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import job
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@job("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@job("tests.flaky")
+def flaky(fail_times):
+    calls.append("try")
+    if len(calls) <= fail_times:
+        raise RuntimeError("temporary failure")
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_enqueued_jobs_run_in_order_with_their_payload():
+    Job.enqueue("tests.record", value=1)
+    Job.enqueue("tests.record", value=2)
+
+    assert Job.run_pending() == 2
+    assert calls == [1, 2]
+    assert set(Job.objects.values_list("status", flat=True)) == {Job.DONE}
+
+
+def test_unknown_job_is_rejected_at_enqueue():
+    with pytest.raises(LookupError):
+        Job.enqueue("tests.missing")
+
+
+def test_delayed_job_waits_until_due():
+    Job.enqueue("tests.record", delay=60, value=1)
+
+    assert Job.run_pending() == 0
+    Job.objects.update(run_at=timezone.now())
+    assert Job.run_pending() == 1
+
+
+def test_failure_is_retried_with_exponential_backoff(settings):
+    settings.JOBS_BACKOFF_BASE = 10
+    queued = Job.enqueue("tests.flaky", fail_times=2)
+
+    before = timezone.now()
+    Job.run_pending()
+    first = Job.objects.get(pk=queued.pk)
+    assert (first.status, first.attempts) == (Job.QUEUED, 1)
+    assert "temporary failure" in first.last_error
+    assert timedelta(seconds=10) <= first.run_at - before <= timedelta(seconds=12)
+
+    Job.objects.update(run_at=timezone.now())
+    Job.run_pending()
+    second = Job.objects.get(pk=queued.pk)
+    assert second.run_at - timezone.now() > timedelta(seconds=19)
+
+    Job.objects.update(run_at=timezone.now())
+    Job.run_pending()
+    done = Job.objects.get(pk=queued.pk)
+    assert (done.status, done.attempts, done.last_error) == (Job.DONE, 3, "")
+
+
+def test_job_fails_for_good_after_max_attempts(caplog):
+    queued = Job.enqueue("tests.flaky", fail_times=99, max_attempts=2)
+    Job.run_pending()
+    assert not caplog.records  # a retry is not an error yet
+    Job.objects.update(run_at=timezone.now())
+    Job.run_pending()
+
+    queued.refresh_from_db()
+    assert (queued.status, queued.attempts) == (Job.FAILED, 2)
+    assert queued.finished_at is not None
+    [record] = caplog.records
+    assert record.levelname == "ERROR"
+    assert "failed permanently after 2 attempts" in record.getMessage()
+
+
+def test_requeue_failed_jobs_command_retries_them():
+    failed = Job.enqueue("tests.flaky", fail_times=1, max_attempts=1)
+    Job.run_pending()
+    Job.enqueue("tests.record", value=1, max_attempts=1)
+    Job.objects.filter(name="tests.record").update(status=Job.FAILED)
+    out = StringIO()
+
+    call_command("requeue_failed_jobs", "tests.flaky", stdout=out)
+
+    assert "Requeued 1 failed jobs." in out.getvalue()
+    assert Job.run_pending() == 1
+    failed.refresh_from_db()
+    assert (failed.status, failed.attempts) == (Job.DONE, 1)
+
+
+def test_stale_running_jobs_are_requeued():
+    queued = Job.enqueue("tests.record", value=1)
+    Job.claim(worker="dead-worker")
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+    assert Job.requeue_stale() == 1
+    assert Job.run_pending() == 1
+    queued.refresh_from_db()
+    assert queued.status == Job.DONE
+
+
+def test_worker_command_once_drains_the_queue():
+    for n in range(3):
+        Job.enqueue("tests.record", value=n)
+    out = StringIO()
+
+    call_command("run_jobs", "--once", "--batch-size", "2", stdout=out)
+
+    assert "Ran 3 jobs." in out.getvalue()
+    assert calls == [0, 1, 2]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Order, OrderItem, Payment
+from .models import Order, OrderItem, Payment, ProductSalesStats, StockReservation
 
 
 class OrderItemInline(admin.TabularInline):
@@ -37,3 +37,20 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ("id", "order", "variant", "status", "total", "currency", "created")
     list_filter = ("variant", "status", "currency", "created")
     search_fields = ("id", "order__order_number", "description")
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "quantity", "shard", "expires_at")
+    list_filter = ("expires_at",)
+    search_fields = ("order__order_number", "product__name")
+    raw_id_fields = ("order", "product")
+
+
+@admin.register(ProductSalesStats)
+class ProductSalesStatsAdmin(admin.ModelAdmin):
+    list_display = ("day", "product", "quantity", "revenue")
+    list_filter = ("day",)
+    search_fields = ("product__name",)
+    raw_id_fields = ("product",)
+    date_hierarchy = "day"
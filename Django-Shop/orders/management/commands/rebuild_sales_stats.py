@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import ProductSalesStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily product sales stats from paid orders."
+
+    def handle(self, *args, **options):
+        rows = ProductSalesStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} product sales rows."))
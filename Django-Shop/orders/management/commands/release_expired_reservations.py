@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = "Release expired stock reservations back to the available stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of reservations released per transaction",
+        )
+
+    def handle(self, *args, **options):
+        released = StockReservation.release_expired(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired stock reservations.")
+        )
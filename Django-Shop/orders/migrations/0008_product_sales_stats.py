@@ -0,0 +1,60 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from orders.models import rebuild_sales_stats
+
+
+def backfill_sales_stats(apps, schema_editor):
+    rebuild_sales_stats(
+        apps.get_model("orders", "ProductSalesStats"),
+        apps.get_model("orders", "OrderItem"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0007_payment_events"),
+        ("products", "0010_productimage_is_primary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSalesStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales_stats",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "product sales stats",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "product"), name="sales_stats_day_product_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_sales_stats, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,21 @@
 import uuid
+from datetime import timedelta
 from decimal import Decimal
 from typing import Optional
 
 from django.conf import settings
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
 from django.urls import reverse
+from django.utils import timezone
 from payments import PaymentStatus, PurchasedItem
 from payments.models import BasePayment
 
 from products.models import Product
 
+from .exceptions import OrderOutOfStock
+
 
 def generate_order_number() -> str:
     """Generate a unique human-friendly order number.
@@ -70,6 +76,23 @@ class Order(models.Model):
     def is_paid(self) -> bool:
         return self.payment_status == PaymentStatus.CONFIRMED
 
+    @property
+    def counts_as_sale(self) -> bool:
+        """Paid and not cancelled or refunded since (see ``ProductSalesStats``)."""
+        return (
+            self.paid_at is not None
+            and self.status != "cancelled"
+            and self.payment_status != PaymentStatus.REFUNDED
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember whether the stored order was counted, so saves can withdraw it
+        if {"paid_at", "status", "payment_status"} <= instance.__dict__.keys():
+            instance._loaded_counts_as_sale = instance.counts_as_sale
+        return instance
+
     # --- Domain operations (fat model pattern) ---
     @classmethod
     @transaction.atomic
@@ -78,14 +101,29 @@ class Order(models.Model):
 
         - Picks user's primary Address for both shipping and billing if available.
         - Snapshots current unit prices into OrderItem.price.
-        - Computes and persists the order total.
+        - Computes the order total from those snapshots.
+
+        The cart lines are loaded once and everything else is computed in
+        memory, so the number of queries does not depend on the number of lines.
         """
         # Lazy imports to avoid circular deps at import time
         from users.models import Address  # noqa: WPS433
 
-        if not cart.total_quantity:
+        lines = list(cart.items)
+        if not lines:
             raise ValueError("Cannot create an order from an empty cart")
 
+        # Snapshot items (unit price at time of order, rounded like the column)
+        cent = Decimal("0.01")
+        order_items = [
+            OrderItem(
+                product=line.product,
+                quantity=line.quantity,
+                price=Decimal(line.unit_price).quantize(cent),
+            )
+            for line in lines
+        ]
+
         # Choose primary address if available; else None
         primary_addr: Optional[Address] = Address.objects.filter(
             user=user, is_primary=True
@@ -97,34 +135,61 @@ class Order(models.Model):
             status="pending",
             shipping_address=primary_addr,
             billing_address=primary_addr,
-            total_amount=Decimal(cart.total),
-        )
-
-        # Snapshot items (unit price at time of order)
-        bulk_items = []
-        for item in cart.items:
-            bulk_items.append(
-                OrderItem(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=Decimal(item.unit_price),
-                )
-            )
-        OrderItem.objects.bulk_create(bulk_items)
-
-        # Recompute total from items to ensure consistency
-        total = sum((oi.price * oi.quantity for oi in order.items.all()), Decimal("0"))
-        if total != order.total_amount:
-            order.total_amount = total
-            (
-                order.save(update_fields=["total_amount", "updated_at"])
-                if hasattr(order, "updated_at")
-                else order.save(update_fields=["total_amount"])
-            )  # pragma: no cover
-
+            total_amount=sum((oi.total for oi in order_items), Decimal("0")),
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
         return order
 
+    def stock_requirements(self) -> dict:
+        """Quantity ordered per product id (lines for the same product summed)."""
+        rows = self.items.values("product_id").annotate(quantity=Sum("quantity"))
+        return {row["product_id"]: row["quantity"] for row in rows}
+
+    @transaction.atomic
+    def decrement_stock(self) -> None:
+        """Take the ordered quantities out of stock, all or nothing.
+
+        Stock held for this order at checkout is converted; anything not held
+        (or whose hold was already swept) is reserved first, which raises
+        ``OrderOutOfStock`` when other orders hold the rest. Product rows are
+        then locked in id order, so two orders sharing products cannot
+        deadlock, and decremented in one conditional UPDATE: fewer affected
+        rows than products means a shortfall, and the savepoint is rolled back.
+
+        The update skips ``post_save``, so it stamps ``updated_at`` itself:
+        only the detail page shows the stock, and its cache key and validators
+        follow ``updated_at``, so the catalog version is left alone.
+        """
+        required = self.stock_requirements()
+        if not required:
+            return
+        held = StockReservation.held_for(self)
+        missing = {
+            product_id: quantity - held.get(product_id, 0)
+            for product_id, quantity in required.items()
+            if quantity > held.get(product_id, 0)
+        }
+        if missing:
+            StockReservation.reserve(self, missing)
+        self.reservations.all().delete()
+
+        products = Product.objects.filter(pk__in=required)
+        list(products.select_for_update().order_by("pk").values_list("pk", flat=True))
+
+        enough_stock = Q()
+        for product_id, quantity in required.items():
+            enough_stock |= Q(pk=product_id, stock__gte=quantity)
+        updated = products.filter(enough_stock).update(
+            stock=F("stock")
+            - Case(*(When(pk=pk, then=qty) for pk, qty in required.items())),
+            updated_at=timezone.now(),
+        )
+        if updated != len(required):
+            short = products.exclude(enough_stock).order_by("pk").first()
+            raise OrderOutOfStock(short, short.stock, required[short.pk])
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
@@ -143,6 +208,394 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
+class ProductSalesStats(models.Model):
+    """Units sold and revenue per product and day, from paid orders.
+
+    Rows are incremented when an order is paid (``record_order``) and
+    decremented when a paid order is cancelled or refunded (``reverse_order``),
+    so best seller lists read a bounded window of days instead of aggregating
+    the whole ``OrderItem`` table. ``rebuild_sales_stats`` recomputes them.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_stats"
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "product sales stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="sales_stats_day_product_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} on {self.day}"
+
+    @staticmethod
+    def totals(items, *group_by):
+        """Units (``sold``) and revenue (``earned``) of order items per group."""
+        return items.values(*group_by).annotate(
+            sold=Sum("quantity"),
+            earned=Sum(
+                F("price") * F("quantity"),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    @classmethod
+    def record_order(cls, order) -> None:
+        """Add a paid order's lines to the stats of the day it was paid."""
+        cls._add_order(order, 1)
+
+    @classmethod
+    def reverse_order(cls, order) -> None:
+        """Take back what ``record_order`` added for a cancelled or refunded order."""
+        cls._add_order(order, -1)
+
+    @classmethod
+    @transaction.atomic
+    def _add_order(cls, order, sign) -> None:
+        """Add ``sign`` times the order's lines to the day it was paid.
+
+        Missing rows are inserted empty, then every line is added in one
+        conditional UPDATE, so concurrent payments never lose an increment.
+        """
+        lines = {
+            row["product_id"]: (sign * row["sold"], sign * row["earned"])
+            for row in cls.totals(order.items.all(), "product_id")
+        }
+        if not lines:
+            return
+        day = timezone.localdate(order.paid_at or timezone.now())
+        cls.objects.bulk_create(
+            [cls(day=day, product_id=product_id) for product_id in lines],
+            ignore_conflicts=True,
+        )
+        cls.objects.filter(day=day, product_id__in=lines).update(
+            quantity=F("quantity")
+            + Case(
+                *(When(product_id=pk, then=sold) for pk, (sold, _) in lines.items())
+            ),
+            revenue=F("revenue")
+            + Case(
+                *(
+                    When(product_id=pk, then=earned)
+                    for pk, (_, earned) in lines.items()
+                ),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    @classmethod
+    def best_sellers(cls, days=7, limit=8, today=None) -> list:
+        """Ids of the most sold products over the last ``days`` days, best first."""
+        today = today or timezone.localdate()
+        since = today - timedelta(days=days - 1)
+        return list(
+            cls.objects.filter(day__gte=since, day__lte=today)
+            .values("product_id")
+            .annotate(sold=Sum("quantity"))
+            .order_by("-sold", "product_id")
+            .values_list("product_id", flat=True)[:limit]
+        )
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls) -> int:
+        """Recompute every row from paid orders; returns the number of rows."""
+        return rebuild_sales_stats(cls, OrderItem)
+
+
+def rebuild_sales_stats(stats_model, item_model) -> int:
+    """Replace the rows of ``stats_model`` with totals of orders counted as sales.
+
+    Takes the models as arguments so the migration that adds the table can
+    backfill it with its historical models.
+    """
+    stats_model.objects.all().delete()
+    sold = (
+        item_model.objects.filter(order__paid_at__isnull=False)
+        .exclude(order__status="cancelled")
+        .exclude(order__payment_status=PaymentStatus.REFUNDED)
+        .annotate(day=TruncDate("order__paid_at"))
+    )
+    rows = ProductSalesStats.totals(sold, "day", "product_id")
+    stats = stats_model.objects.bulk_create(
+        stats_model(
+            day=row["day"],
+            product_id=row["product_id"],
+            quantity=row["sold"],
+            revenue=row["earned"],
+        )
+        for row in rows
+    )
+    return len(stats)
+
+
+def split_evenly(total: int, parts: int) -> list:
+    """Split ``total`` into ``parts`` integers differing by at most one."""
+    base, extra = divmod(max(total, 0), parts)
+    return [base + (1 if n < extra else 0) for n in range(parts)]
+
+
+class StockShard(models.Model):
+    """One slice of a product's unreserved stock.
+
+    Each product's ``stock - active holds`` is spread over
+    ``STOCK_RESERVATION_SHARDS`` rows. A checkout takes its quantity from one
+    shard with a conditional UPDATE, so concurrent checkouts of a hot product
+    lock different rows instead of queueing on the product row. Only when no
+    single shard can cover a quantity are all of the product's shards locked
+    (in shard order) and drained together.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_shards"
+    )
+    shard = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "shard"], name="uniq_stock_shard_per_product"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.available}"
+
+    @staticmethod
+    def shard_count() -> int:
+        return settings.STOCK_RESERVATION_SHARDS
+
+    @classmethod
+    def ensure(cls, product_ids) -> None:
+        """Create shards for products that have none yet (seeded from stock)."""
+        seeded = set(
+            cls.objects.filter(product_id__in=product_ids)
+            .values_list("product_id", flat=True)
+            .distinct()
+        )
+        missing = [pk for pk in product_ids if pk not in seeded]
+        if not missing:
+            return
+        cls.objects.bulk_create(
+            [
+                cls(product_id=row["pk"], shard=shard, available=available)
+                for row in Product.objects.filter(pk__in=missing).values("pk", "stock")
+                for shard, available in enumerate(
+                    split_evenly(row["stock"], cls.shard_count())
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    @transaction.atomic
+    def rebalance(cls, product_ids) -> None:
+        """Reset the shards of already seeded products to ``stock - active holds``.
+
+        Called when stock is edited outside of order confirmation.
+        """
+        shards = cls.objects.filter(product_id__in=product_ids)
+        locked = list(shards.select_for_update().order_by("product_id", "shard"))
+        if not locked:
+            return
+        seeded = {shard.product_id for shard in locked}
+        stock = dict(Product.objects.filter(pk__in=seeded).values_list("pk", "stock"))
+        held = StockReservation.held_by_product(seeded)
+        by_key = {(shard.product_id, shard.shard): shard for shard in locked}
+        for product_id in seeded:
+            target = split_evenly(
+                stock[product_id] - held.get(product_id, 0), cls.shard_count()
+            )
+            for number, available in enumerate(target):
+                shard = by_key.setdefault(
+                    (product_id, number), cls(product_id=product_id, shard=number)
+                )
+                shard.available = available
+        cls.objects.bulk_update([s for s in by_key.values() if s.pk], ["available"])
+        cls.objects.bulk_create([s for s in by_key.values() if not s.pk])
+
+    @classmethod
+    def take(cls, product_id: int, quantity: int, start: int = 0) -> list:
+        """Remove ``quantity`` from a product's shards.
+
+        Shards are tried from ``start`` (modulo the shard count) onwards;
+        ``reserve`` passes the order id, so concurrent orders start on
+        different shards while a given order always takes the same path.
+        Returns ``[(shard, quantity), ...]`` describing where it was taken
+        from; raises ``OrderOutOfStock`` when the shards hold too little.
+        """
+        shards = cls.objects.filter(product_id=product_id)
+        count = cls.shard_count()
+        start %= count
+        for offset in range(count):
+            number = (start + offset) % count
+            taken = shards.filter(shard=number, available__gte=quantity).update(
+                available=F("available") - quantity
+            )
+            if taken:
+                return [(number, quantity)]
+
+        # No single shard is big enough: drain several under the product's locks
+        locked = list(shards.select_for_update().order_by("shard"))
+        available = sum(shard.available for shard in locked)
+        if available < quantity:
+            raise OrderOutOfStock(
+                Product.objects.get(pk=product_id), available, quantity
+            )
+        parts, remaining = [], quantity
+        for shard in locked:
+            part = min(shard.available, remaining)
+            if part:
+                shards.filter(pk=shard.pk).update(available=F("available") - part)
+                parts.append((shard.shard, part))
+                remaining -= part
+            if not remaining:
+                break
+        return parts
+
+    @classmethod
+    def give_back(cls, amounts) -> None:
+        """Return ``{(product_id, shard): quantity}`` to the shards it came from."""
+        for (product_id, shard), quantity in sorted(amounts.items()):
+            cls.objects.filter(product_id=product_id, shard=shard).update(
+                available=F("available") + quantity
+            )
+
+
+class StockReservation(models.Model):
+    """Stock held for a pending order between checkout and payment.
+
+    Available stock is ``stock - active holds``; the held quantity lives in
+    these rows rather than in the product's shards. Payment confirmation turns
+    the holds into a stock decrement (``Order.decrement_stock``) and the
+    ``release_expired_reservations`` command hands expired holds back.
+    """
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_reservations"
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "expires_at"], name="reservation_product_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+
+    @classmethod
+    @transaction.atomic
+    def reserve(cls, order, quantities=None, ttl=None) -> list:
+        """Hold stock for the order (all of its items unless ``quantities`` given).
+
+        All or nothing: raises ``OrderOutOfStock`` without holding anything
+        when a product is short.
+        """
+        if quantities is None:
+            quantities = order.stock_requirements()
+        StockShard.ensure(list(quantities))
+        ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        holds = [
+            cls(
+                order=order,
+                product_id=product_id,
+                shard=shard,
+                quantity=taken,
+                expires_at=expires_at,
+            )
+            for product_id, quantity in sorted(quantities.items())
+            for shard, taken in StockShard.take(product_id, quantity, start=order.pk)
+        ]
+        return cls.objects.bulk_create(holds)
+
+    @classmethod
+    def held_for(cls, order) -> dict:
+        """Quantity per product held for the order, with its holds locked.
+
+        Expired but unswept holds still count: their stock has not been
+        handed back yet.
+        """
+        held = {}
+        for hold in order.reservations.select_for_update().order_by("pk"):
+            held[hold.product_id] = held.get(hold.product_id, 0) + hold.quantity
+        return held
+
+    @classmethod
+    def held_by_product(cls, product_ids) -> dict:
+        rows = (
+            cls.objects.filter(product_id__in=product_ids)
+            .values("product_id")
+            .annotate(quantity=Sum("quantity"))
+        )
+        return {row["product_id"]: row["quantity"] for row in rows}
+
+    @classmethod
+    def available_stock(cls, product_ids) -> dict:
+        """``stock - held`` for each product id, in one query."""
+        return dict(
+            cls.with_available_stock(
+                Product.objects.filter(pk__in=product_ids)
+            ).values_list("pk", "available_stock")
+        )
+
+    @classmethod
+    def with_available_stock(cls, products):
+        """Annotate a product queryset with ``available_stock`` (``stock - held``)."""
+        held = (
+            cls.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+            .annotate(quantity=Sum("quantity"))
+            .values("quantity")
+        )
+        return products.annotate(
+            available_stock=F("stock") - Coalesce(Subquery(held), 0)
+        )
+
+    @classmethod
+    @transaction.atomic
+    def release(cls, holds) -> int:
+        """Delete the given holds and give their stock back to the shards."""
+        holds = list(holds.select_for_update().order_by("pk"))
+        amounts = {}
+        for hold in holds:
+            key = (hold.product_id, hold.shard)
+            amounts[key] = amounts.get(key, 0) + hold.quantity
+        cls.objects.filter(pk__in=[hold.pk for hold in holds]).delete()
+        StockShard.give_back(amounts)
+        return len(holds)
+
+    @classmethod
+    def release_expired(cls, batch_size=500, now=None) -> int:
+        """Release expired holds, ``batch_size`` per transaction; returns the count."""
+        now = now or timezone.now()
+        released = 0
+        while True:
+            batch = cls.objects.filter(expires_at__lte=now).order_by("expires_at")
+            ids = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return released
+            released += cls.release(cls.objects.filter(pk__in=ids, expires_at__lte=now))
+
+
 class Payment(BasePayment):
     """Payment record managed by django-payments, attached to an Order."""
 
@@ -173,3 +626,78 @@ class Payment(BasePayment):
             price=Decimal(self.total),
             currency=self.currency,
         )
+
+
+class PaymentEvent(models.Model):
+    """A payment status transition that has already been applied to its order.
+
+    Providers retry webhooks and django-payments saves a payment several times
+    per callback, so ``sync_order_payment_status`` sees the same transition
+    over and over, sometimes after a later one. Statuses are ranked by how far
+    they move a payment; a transition is processed only if nothing of the same
+    or a higher rank was recorded for the payment before, checked with one
+    lookup on the ``(payment, rank)`` unique index. ``event_id`` keeps the
+    provider event that caused it, so retried webhooks are dropped up front
+    (see ``orders.providers``).
+    """
+
+    STATUS_RANK = {
+        PaymentStatus.WAITING: 0,
+        PaymentStatus.INPUT: 1,
+        PaymentStatus.PREAUTH: 2,
+        PaymentStatus.REJECTED: 3,
+        PaymentStatus.ERROR: 3,
+        PaymentStatus.CONFIRMED: 4,
+        PaymentStatus.REFUNDED: 5,
+    }
+
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, related_name="events"
+    )
+    status = models.CharField(max_length=10, choices=PaymentStatus.CHOICES)
+    rank = models.PositiveSmallIntegerField()
+    event_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["payment", "rank"], name="uniq_payment_event_rank"
+            )
+        ]
+
+    def __str__(self):
+        return f"Payment {self.payment_id}: {self.status}"
+
+    @classmethod
+    def is_processed(cls, payment, status) -> bool:
+        """True for duplicates and for transitions older than one already applied."""
+        return cls.objects.filter(
+            payment=payment, rank__gte=cls.STATUS_RANK.get(status, 0)
+        ).exists()
+
+    @classmethod
+    def is_superseded(cls, payment, status) -> bool:
+        """True once a transition past ``status`` has been recorded."""
+        return cls.objects.filter(
+            payment=payment, rank__gt=cls.STATUS_RANK.get(status, 0)
+        ).exists()
+
+    @classmethod
+    def record(cls, payment, status, event_id=None) -> bool:
+        """Claim a transition; False if a concurrent delivery claimed it first."""
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    payment=payment,
+                    status=status,
+                    rank=cls.STATUS_RANK.get(status, 0),
+                    event_id=event_id,
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    def seen_provider_event(cls, event_id) -> bool:
+        return bool(event_id) and cls.objects.filter(event_id=event_id).exists()
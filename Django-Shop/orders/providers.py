@@ -0,0 +1,45 @@
+"""Payment providers configured in ``PAYMENT_VARIANTS``."""
+
+from django.http import JsonResponse
+from payments import PaymentStatus
+from payments.stripe import StripeProviderV3
+
+from .models import PaymentEvent
+
+
+class StripeProvider(StripeProviderV3):
+    """Stripe Checkout provider that processes each webhook event once.
+
+    Stripe retries deliveries until it gets a 2xx; events whose id is already
+    recorded on a ``PaymentEvent``, and events whose status was already
+    reached or passed (a session expiring after it was paid), are acknowledged
+    without touching the payment. The parsed (and verified) event is kept on the request, as
+    django-payments reads it more than once per callback.
+    """
+
+    def return_event_payload(self, request):
+        if not hasattr(request, "_stripe_event"):
+            request._stripe_event = super().return_event_payload(request)
+        return request._stripe_event
+
+    @staticmethod
+    def event_status(event):
+        """The payment status the event moves to (as in ``process_data``), or None."""
+        session = (event.get("data") or {}).get("object") or {}
+        if session.get("status") == "expired":
+            return PaymentStatus.REJECTED
+        if session.get("payment_status") == "paid":
+            return PaymentStatus.CONFIRMED
+        return None
+
+    def process_data(self, payment, request):
+        event = self.return_event_payload(request)
+        event_id = event.get("id")
+        if PaymentEvent.seen_provider_event(event_id):
+            return JsonResponse({"status": "OK"})
+        status = self.event_status(event)
+        if status is not None and PaymentEvent.is_processed(payment, status):
+            return JsonResponse({"status": "OK"})
+        # Picked up by sync_order_payment_status when the status changes
+        payment.provider_event_id = event_id
+        return super().process_data(payment, request)
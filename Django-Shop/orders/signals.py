@@ -1,54 +1,53 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.utils import timezone
 from payments import PaymentStatus
 
-from .exceptions import OrderOutOfStock
-from .models import Payment
+from jobs.models import Job
+from products.models import Product
+
+from .models import Order, Payment, PaymentEvent, ProductSalesStats, StockShard
 
 
 @receiver(post_save, sender=Payment)
 def sync_order_payment_status(sender, instance: Payment, **kwargs):
-    order = instance.order
-    new_status = instance.status
-
-    updated_fields = set()
-
-    if getattr(order, "payment_status", None) != new_status:
-        order.payment_status = new_status
-        updated_fields.add("payment_status")
-
-    # Decrement stock on first payment confirmation
-    if new_status == PaymentStatus.CONFIRMED and not getattr(order, "paid_at", None):
-        from django.db import transaction
-
-        try:
-            with transaction.atomic():
-                for item in order.items.select_related("product").select_for_update():
-                    product = item.product
-                    if product.stock < item.quantity:
-                        raise OrderOutOfStock(product, product.stock, item.quantity)
-                # Decrement stock
-                for item in order.items.select_related("product").select_for_update():
-                    product = item.product
-                    product.stock -= item.quantity
-                    product.save(update_fields=["stock"])
-        except OrderOutOfStock as e:
-            # Mark order/payment as failed, set error message
-            order.status = "cancelled"
-            order.payment_status = PaymentStatus.ERROR
-            order.save(update_fields=["status", "payment_status", "updated_at"])
-            instance.status = PaymentStatus.ERROR
-            instance.message = str(e)
-            instance.save(update_fields=["status", "message", "modified"])
-            return
-        order.paid_at = timezone.now()
-        updated_fields.add("paid_at")
-        # Advance order status from pending -> processing on first payment confirmation
-        if getattr(order, "status", None) == "pending":
-            order.status = "processing"
-            updated_fields.add("status")
-
-    if updated_fields:
-        updated_fields.add("updated_at")
-        order.save(update_fields=list(updated_fields))
+    """Queue the order update for a new payment status (see ``orders.tasks``).
+
+    Retried webhooks and repeated saves end here after one indexed lookup,
+    before the order or its products are read or locked.
+    """
+    if PaymentEvent.is_processed(instance, instance.status):
+        return
+    with transaction.atomic():
+        # Claimed and queued together: a rolled back callback does neither
+        claimed = PaymentEvent.record(
+            instance,
+            instance.status,
+            event_id=getattr(instance, "provider_event_id", None),
+        )
+        # Orders start out waiting, nothing to apply for a new payment
+        if claimed and instance.status != PaymentStatus.WAITING:
+            Job.enqueue(
+                "orders.apply_payment_status",
+                payment_id=instance.pk,
+                status=instance.status,
+            )
+
+
+@receiver(post_save, sender=Product)
+def rebalance_stock_shards(
+    sender, instance: Product, created, update_fields=None, **kwargs
+):
+    """Keep the reservation shards in line with stock edited by hand (admin, imports)."""
+    if created or (update_fields is not None and "stock" not in update_fields):
+        return
+    StockShard.rebalance([instance.pk])
+
+
+@receiver(post_save, sender=Order)
+def withdraw_voided_sales(sender, instance: Order, **kwargs):
+    """Take a paid order out of the sales stats once cancelled or refunded."""
+    counted = getattr(instance, "_loaded_counts_as_sale", False)
+    instance._loaded_counts_as_sale = instance.counts_as_sale
+    if counted and not instance.counts_as_sale:
+        ProductSalesStats.reverse_order(instance)
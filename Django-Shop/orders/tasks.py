@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.utils import timezone
+from payments import PaymentStatus
+
+from jobs.registry import job
+
+from .exceptions import OrderOutOfStock
+from .models import Payment, PaymentEvent, ProductSalesStats, StockReservation
+
+
+@job("orders.apply_payment_status")
+@transaction.atomic
+def apply_payment_status(payment_id, status):
+    """Mirror a payment status on its order, decrementing stock once paid.
+
+    Queued by ``sync_order_payment_status``; skipped when a later transition
+    of the same payment was recorded meanwhile, as jobs may run out of order.
+    Atomic, so a retried run never finds the stock half decremented.
+    """
+    payment = Payment.objects.select_related("order").get(pk=payment_id)
+    if PaymentEvent.is_superseded(payment, status):
+        return
+    order = payment.order
+
+    updated_fields = set()
+
+    if getattr(order, "payment_status", None) != status:
+        order.payment_status = status
+        updated_fields.add("payment_status")
+
+    # Decrement stock on first payment confirmation
+    if status == PaymentStatus.CONFIRMED and not getattr(order, "paid_at", None):
+        try:
+            order.decrement_stock()
+        except OrderOutOfStock as e:
+            # Hand back whatever was held for the order, it will not be paid
+            StockReservation.release(order.reservations.all())
+            # Mark order/payment as failed, set error message
+            order.status = "cancelled"
+            order.payment_status = PaymentStatus.ERROR
+            order.save(update_fields=["status", "payment_status", "updated_at"])
+            payment.status = PaymentStatus.ERROR
+            payment.message = str(e)
+            payment.save(update_fields=["status", "message", "modified"])
+            return
+        order.paid_at = timezone.now()
+        updated_fields.add("paid_at")
+        ProductSalesStats.record_order(order)
+        # Advance order status from pending -> processing on first payment confirmation
+        if getattr(order, "status", None) == "pending":
+            order.status = "processing"
+            updated_fields.add("status")
+
+    if updated_fields:
+        updated_fields.add("updated_at")
+        order.save(update_fields=list(updated_fields))
@@ -0,0 +1,36 @@
+import pytest
+from model_bakery import baker
+from payments import PaymentStatus
+
+from jobs.models import Job
+from orders.models import Order, Payment
+
+
+@pytest.fixture
+def order_factory(db, user):
+    """Factory for unpaid orders of ``user`` from ``(product, quantity)`` lines."""
+
+    def _make(*lines, **overrides) -> Order:
+        defaults = dict(user=user, total_amount=100)
+        defaults.update(overrides)
+        order = baker.make(Order, **defaults)
+        for product, quantity in lines:
+            order.items.create(product=product, quantity=quantity, price=product.price)
+        return order
+
+    return _make
+
+
+@pytest.fixture
+def confirm_payment(db):
+    """Confirm a payment for the order and run the jobs it queues."""
+
+    def _confirm(order) -> Payment:
+        payment = baker.make(Payment, order=order, status=PaymentStatus.WAITING)
+        payment.status = PaymentStatus.CONFIRMED
+        payment.save()
+        Job.run_pending()
+        payment.refresh_from_db()
+        return payment
+
+    return _confirm
@@ -1,7 +1,12 @@
+from decimal import Decimal
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from payments import PaymentStatus
 
+from jobs.models import Job
 from orders.models import Order, Payment
 
 pytestmark = pytest.mark.django_db
@@ -19,7 +24,51 @@ def test_stock_decrements_on_payment_confirmation(user, product_factory):
     # Act: confirm the payment (simulate webhook or admin action)
     payment.status = PaymentStatus.CONFIRMED
     payment.save()
+    # The order update runs as a background job
+    assert product.stock == initial_stock
+    Job.run_pending()
     product.refresh_from_db()
 
     # Assert: stock is decremented by order item quantity
     assert product.stock == initial_stock - order_item.quantity
+
+
+def _order_queries(user, cart, products):
+    for product in products:
+        cart.add_product(product, 2)
+    cart = type(cart).objects.get(pk=cart.pk)
+    with CaptureQueriesContext(connection) as ctx:
+        order = Order.create_from_cart(cart=cart, user=user)
+    return order, len(ctx.captured_queries)
+
+
+def test_create_from_cart_query_count_does_not_grow_with_lines(
+    user, cart, product_factory
+):
+    _, few = _order_queries(user, cart, [product_factory() for _ in range(2)])
+    cart.clear()
+    order, many = _order_queries(user, cart, [product_factory() for _ in range(12)])
+
+    assert many == few
+    assert order.items.count() == 12
+
+
+def test_create_from_cart_snapshots_rounded_prices_and_total(
+    user, cart, product_factory
+):
+    discounted = product_factory(price=Decimal("33.33"), discount_percent=Decimal("10"))
+    plain = product_factory(price=Decimal("5.00"))
+    cart.add_product(discounted, 3)
+    cart.add_product(plain, 1)
+
+    order = Order.create_from_cart(cart=cart, user=user)
+
+    prices = dict(order.items.values_list("product_id", "price"))
+    assert prices == {discounted.id: Decimal("30.00"), plain.id: Decimal("5.00")}
+    order.refresh_from_db()
+    assert order.total_amount == Decimal("95.00")
+
+
+def test_create_from_empty_cart_raises(user, cart):
+    with pytest.raises(ValueError):
+        Order.create_from_cart(cart=cart, user=user)
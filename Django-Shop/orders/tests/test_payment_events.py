@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from payments import PaymentStatus
+
+from jobs.models import Job
+from orders.models import Order, Payment, PaymentEvent
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def payment(user, product_factory):
+    product = product_factory(stock=10)
+    order = baker.make(Order, user=user, total_amount=100)
+    order.items.create(product=product, quantity=2, price=product.price)
+    return Payment.objects.create(
+        order=order, variant="stripe", total=100, currency="USD"
+    )
+
+
+def deliver(client, payment, event_id, *, paid=True, expired=False):
+    """POST a Stripe Checkout webhook for the payment, as Stripe would."""
+    session = {
+        "client_reference_id": payment.token,
+        "status": "expired" if expired else "complete",
+        "payment_status": "paid" if paid else "unpaid",
+    }
+    event = {
+        "id": event_id,
+        "type": "checkout.session.expired" if expired else "checkout.session.completed",
+        "data": {"object": session},
+    }
+    return client.post(
+        f"/payments/process/{payment.token}/",
+        json.dumps(event),
+        content_type="application/json",
+    )
+
+
+def test_webhook_storm_is_applied_once(client, payment):
+    product = payment.order.items.get().product
+
+    responses = [deliver(client, payment, "evt_paid") for _ in range(25)]
+    responses += [deliver(client, payment, f"evt_other_{n}") for n in range(5)]
+    responses.append(deliver(client, payment, "evt_late", expired=True))
+    assert Job.run_pending() == 1
+
+    assert {r.status_code for r in responses} == {200}
+    product.refresh_from_db()
+    payment.refresh_from_db()
+    order = payment.order
+    assert product.stock == 8
+    assert (order.status, order.payment_status) == ("processing", "confirmed")
+    assert payment.status == PaymentStatus.CONFIRMED  # late expiry is dropped
+    assert list(
+        PaymentEvent.objects.filter(payment=payment).values_list("status", "event_id")
+    ) == [("waiting", None), ("confirmed", "evt_paid")]
+
+
+def test_replayed_event_skips_order_and_product_tables(client, payment):
+    deliver(client, payment, "evt_paid")
+    Job.run_pending()
+
+    with CaptureQueriesContext(connection) as ctx:
+        deliver(client, payment, "evt_paid")
+
+    touched = " ".join(q["sql"] for q in ctx.captured_queries)
+    assert "orders_order" not in touched
+    assert "products_product" not in touched
+
+
+def test_out_of_order_status_does_not_regress_order(payment):
+    payment.status = PaymentStatus.CONFIRMED
+    payment.save()
+    payment.status = PaymentStatus.PREAUTH
+    payment.save()
+    Job.run_pending()
+
+    payment.order.refresh_from_db()
+    assert payment.order.payment_status == PaymentStatus.CONFIRMED
+
+
+def test_confirmation_after_rejection_is_processed(payment):
+    payment.status = PaymentStatus.REJECTED
+    payment.save()
+    payment.status = PaymentStatus.CONFIRMED
+    payment.save()
+    Job.run_pending()
+
+    payment.order.refresh_from_db()
+    assert payment.order.status == "processing"
+
+
+def test_expiry_after_payment_leaves_the_payment_confirmed(client, payment):
+    deliver(client, payment, "evt_paid")
+    Job.run_pending()
+
+    response = deliver(client, payment, "evt_expired", expired=True)
+
+    assert response.status_code == 200
+    payment.refresh_from_db()
+    assert payment.status == PaymentStatus.CONFIRMED
+    assert not Job.objects.filter(status=Job.QUEUED).exists()
@@ -0,0 +1,169 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+
+from orders.exceptions import OrderOutOfStock
+from orders.models import Order, StockReservation, StockShard
+
+pytestmark = pytest.mark.django_db
+
+
+def unreserved(product):
+    return StockShard.objects.filter(product=product).aggregate(n=Sum("available"))["n"]
+
+
+def available(product):
+    return StockReservation.available_stock([product.pk])[product.pk]
+
+
+def test_reserve_holds_stock_without_touching_product(product_factory, order_factory):
+    product = product_factory(stock=10)
+    StockReservation.reserve(order_factory((product, 3)))
+
+    product.refresh_from_db()
+    assert product.stock == 10
+    assert available(product) == 7
+    assert unreserved(product) == 7
+    assert StockShard.objects.filter(product=product).count() == 8
+
+
+def test_quantity_larger_than_any_shard_spans_shards(product_factory, order_factory):
+    product = product_factory(stock=10)  # 8 shards of 1-2 units
+    holds = StockReservation.reserve(order_factory((product, 7)))
+
+    assert len(holds) > 1
+    assert sum(hold.quantity for hold in holds) == 7
+    assert unreserved(product) == 3
+
+
+def test_orders_start_taking_from_the_shard_of_their_id(product_factory, order_factory):
+    product = product_factory(stock=16)  # 8 shards of 2
+    orders = [order_factory((product, 1)) for _ in range(3)]
+
+    holds = [StockReservation.reserve(order)[0] for order in orders]
+
+    assert [hold.shard for hold in holds] == [order.pk % 8 for order in orders]
+    other = product_factory(stock=16)
+    StockShard.ensure([other.pk])
+    assert StockShard.take(other.pk, 2, start=11) == [(3, 2)]
+    assert StockShard.take(other.pk, 2, start=11) == [(4, 2)]  # shard 3 is empty
+
+
+def test_reserve_fails_when_others_hold_the_stock(product_factory, order_factory):
+    product = product_factory(stock=10)
+    StockReservation.reserve(order_factory((product, 8)))
+    late = order_factory((product_factory(stock=5), 1), (product, 3))
+
+    with pytest.raises(OrderOutOfStock) as exc:
+        StockReservation.reserve(late)
+
+    assert (exc.value.available, exc.value.requested) == (2, 3)
+    assert not late.reservations.exists()
+    assert available(product) == 2
+
+
+def test_confirmation_converts_holds_into_decrement(
+    product_factory, order_factory, confirm_payment
+):
+    product = product_factory(stock=10)
+    order = order_factory((product, 3))
+    StockReservation.reserve(order)
+
+    confirm_payment(order)
+
+    product.refresh_from_db()
+    order.refresh_from_db()
+    assert order.status == "processing"
+    assert product.stock == 7
+    assert not order.reservations.exists()
+    assert unreserved(product) == 7
+
+
+def test_unreserved_order_cannot_take_held_stock(
+    product_factory, order_factory, confirm_payment
+):
+    product = product_factory(stock=5)
+    holder, latecomer = order_factory((product, 5)), order_factory((product, 1))
+    StockReservation.reserve(holder)
+
+    confirm_payment(latecomer)
+    confirm_payment(holder)
+
+    holder.refresh_from_db()
+    latecomer.refresh_from_db()
+    product.refresh_from_db()
+    assert (holder.status, latecomer.status) == ("processing", "cancelled")
+    assert product.stock == 0
+
+
+def test_sweeper_releases_expired_holds_in_batches(product_factory, order_factory):
+    product = product_factory(stock=24)  # 8 shards of 3: every hold fits one shard
+    for _ in range(5):
+        StockReservation.reserve(order_factory((product, 1)), ttl=0)
+    fresh = order_factory((product, 2))
+    StockReservation.reserve(fresh)
+
+    out = StringIO()
+    call_command("release_expired_reservations", "--batch-size", "2", stdout=out)
+
+    assert "Released 5 expired" in out.getvalue()
+    assert StockReservation.objects.get().order == fresh
+    assert available(product) == unreserved(product) == 22
+
+
+def test_expired_but_unswept_hold_still_converts(
+    product_factory, order_factory, confirm_payment
+):
+    product = product_factory(stock=3)
+    order = order_factory((product, 3))
+    StockReservation.reserve(order)
+    order.reservations.update(expires_at=timezone.now() - timedelta(hours=1))
+
+    confirm_payment(order)
+
+    product.refresh_from_db()
+    assert product.stock == 0
+
+
+def test_stock_edit_rebalances_shards(product_factory, order_factory):
+    product = product_factory(stock=10)
+    StockReservation.reserve(order_factory((product, 4)))
+
+    product.stock = 20
+    product.save()
+
+    assert unreserved(product) == 16
+
+
+def test_checkout_reserves_stock(client, user, product_factory):
+    product = product_factory(stock=4)
+    baker.make("users.Address", user=user, is_primary=True)
+    client.force_login(user)
+    client.post(reverse("cart:add", args=[product.id]), {"quantity": 3})
+
+    response = client.post(reverse("orders:checkout"))
+
+    order = Order.objects.get()
+    assert response.url == reverse("orders:start_payment", args=[order.id])
+    assert order.reservations.aggregate(n=Sum("quantity"))["n"] == 3
+
+
+def test_checkout_without_available_stock_creates_no_order(
+    client, user, product_factory, order_factory
+):
+    product = product_factory(stock=4)
+    StockReservation.reserve(order_factory((product, 3)))
+    baker.make("users.Address", user=user, is_primary=True)
+    client.force_login(user)
+    client.post(reverse("cart:add", args=[product.id]), {"quantity": 2})
+
+    response = client.post(reverse("orders:checkout"))
+
+    assert response.url == reverse("cart:detail")
+    assert Order.objects.count() == 1
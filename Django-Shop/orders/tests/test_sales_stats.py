@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from payments import PaymentStatus
+
+from jobs.models import Job
+from orders.models import Order, ProductSalesStats
+from products.models import Product
+
+pytestmark = pytest.mark.django_db
+
+
+def test_paying_an_order_adds_its_lines_to_todays_stats(order_factory, confirm_payment):
+    tee, mug = baker.make(Product, stock=10, price=Decimal("5.00"), _quantity=2)
+    order = order_factory((tee, 2), (mug, 1), (tee, 1))
+    confirm_payment(order)
+
+    stats = {
+        s.product_id: (s.quantity, s.revenue)
+        for s in ProductSalesStats.objects.filter(day=timezone.localdate())
+    }
+    assert stats == {tee.pk: (3, Decimal("15.00")), mug.pk: (1, Decimal("5.00"))}
+
+
+def test_record_order_increments_existing_rows(
+    django_assert_num_queries, order_factory
+):
+    tee = baker.make(Product, stock=10, price=Decimal("5.00"))
+    ProductSalesStats.record_order(order_factory((tee, 2)))
+    second = order_factory((tee, 4))
+
+    # lines, insert missing rows, increment (inside a savepoint)
+    with django_assert_num_queries(5):
+        ProductSalesStats.record_order(second)
+
+    stats = ProductSalesStats.objects.get(product=tee)
+    assert (stats.quantity, stats.revenue) == (6, Decimal("30.00"))
+
+
+def test_best_sellers_only_counts_the_window():
+    today = date(2024, 5, 10)
+    old_hit, new_hit, steady = baker.make(Product, _quantity=3)
+    baker.make(
+        ProductSalesStats, product=old_hit, day=today - timedelta(days=20), quantity=100
+    )
+    baker.make(ProductSalesStats, product=new_hit, day=today, quantity=5)
+    baker.make(
+        ProductSalesStats, product=steady, day=today - timedelta(days=1), quantity=2
+    )
+    baker.make(
+        ProductSalesStats, product=steady, day=today - timedelta(days=6), quantity=2
+    )
+
+    assert ProductSalesStats.best_sellers(days=7, today=today) == [
+        new_hit.pk,
+        steady.pk,
+    ]
+    assert ProductSalesStats.best_sellers(days=30, today=today)[0] == old_hit.pk
+    assert ProductSalesStats.best_sellers(days=7, limit=1, today=today) == [new_hit.pk]
+
+
+def test_rebuild_recomputes_stats_from_paid_orders(order_factory):
+    tee = baker.make(Product, price=Decimal("5.00"))
+    paid_at = timezone.now() - timedelta(days=2)
+    order_factory((tee, 2), paid_at=paid_at)
+    order_factory((tee, 3), paid_at=paid_at)
+    order_factory((tee, 7))  # unpaid
+    cancelled = order_factory((tee, 4), paid_at=paid_at)
+    Order.objects.filter(pk=cancelled.pk).update(status="cancelled")
+    baker.make(ProductSalesStats, product=tee, day=timezone.localdate(), quantity=99)
+    out = StringIO()
+
+    call_command("rebuild_sales_stats", stdout=out)
+
+    assert "Rebuilt 1 product sales rows." in out.getvalue()
+    stats = ProductSalesStats.objects.get()
+    assert (stats.day, stats.quantity) == (timezone.localdate(paid_at), 5)
+
+
+def todays_quantity(product):
+    return ProductSalesStats.objects.get(
+        product=product, day=timezone.localdate()
+    ).quantity
+
+
+def test_refunding_a_paid_order_takes_it_out_of_the_stats(
+    order_factory, confirm_payment
+):
+    tee = baker.make(Product, stock=10, price=Decimal("5.00"))
+    confirm_payment(order_factory((tee, 1)))
+    payment = confirm_payment(order_factory((tee, 2)))
+    assert todays_quantity(tee) == 3
+
+    payment.status = PaymentStatus.REFUNDED
+    payment.save()
+    Job.run_pending()
+
+    assert todays_quantity(tee) == 1
+
+
+def test_cancelling_a_paid_order_takes_it_out_of_the_stats_once(
+    order_factory, confirm_payment
+):
+    tee = baker.make(Product, stock=10, price=Decimal("5.00"))
+    order = order_factory((tee, 2))
+    confirm_payment(order)
+    order = Order.objects.get(pk=order.pk)
+
+    order.status = "cancelled"
+    order.save()
+    order.payment_status = PaymentStatus.REFUNDED
+    order.save()
+
+    stats = ProductSalesStats.objects.get(product=tee)
+    assert (stats.quantity, stats.revenue) == (0, Decimal("0.00"))
+
+
+def test_home_page_lists_best_sellers_in_rank_order(client):
+    first, second = baker.make(Product, is_available=True, _quantity=2)
+    baker.make(ProductSalesStats, product=first, day=timezone.localdate(), quantity=9)
+    baker.make(ProductSalesStats, product=second, day=timezone.localdate(), quantity=12)
+
+    response = client.get(reverse("home:index"))
+
+    assert response.context["most_bought_products"] == [second, first]
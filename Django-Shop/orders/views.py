@@ -3,15 +3,19 @@ from decimal import Decimal
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView
 from payments import RedirectNeeded, get_payment_model
 
 from cart.models import Cart
+from products.models import Product
 from users.models import Address
 
-from .models import Order
+from .exceptions import OrderOutOfStock
+from .models import Order, StockReservation
 
 # Create your views here.
 
@@ -22,7 +26,14 @@ class OrderListView(LoginRequiredMixin, ListView):
     context_object_name = "orders"
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by("-created_at")
+        return (
+            Order.objects.filter(user=self.request.user)
+            .order_by("-created_at")
+            .prefetch_related(
+                "items",
+                Prefetch("items__product", queryset=Product.objects.with_card_data()),
+            )
+        )
 
 
 @login_required
@@ -71,8 +82,8 @@ def payment_failed(request, order_id: int):
 @login_required
 @require_POST
 def checkout_from_cart(request):
-    cart = Cart.get_or_create_for_request(request)
-    if not cart.total_quantity:
+    cart = Cart.get_for_request(request)
+    if not cart or not cart.summary()["total_quantity"]:
         messages.error(request, "Your cart is empty.")
         return redirect("cart:detail")
 
@@ -84,7 +95,14 @@ def checkout_from_cart(request):
         )
         return redirect("users:addresses")
 
-    order = Order.create_from_cart(cart=cart, user=request.user)
+    try:
+        with transaction.atomic():
+            order = Order.create_from_cart(cart=cart, user=request.user)
+            # Hold the stock until the payment comes back (or the hold expires)
+            StockReservation.reserve(order)
+    except OrderOutOfStock as e:
+        messages.error(request, str(e))
+        return redirect("cart:detail")
     # Create a payment in POST (safe from CSRF); GET view will only present/redirect
     Payment = get_payment_model()
     payment = (
@@ -21,6 +21,25 @@ class ReviewInline(admin.TabularInline):
     verbose_name_plural = "Product Reviews"
 
 
+class RatingFilter(admin.SimpleListFilter):
+    title = "rating"
+    parameter_name = "rating"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("4", "4+ stars"),
+            ("3", "3+ stars"),
+            ("unrated", "No ratings"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "unrated":
+            return queryset.filter(rating_count=0)
+        if self.value() in ("3", "4"):
+            return queryset.filter(rating_avg__gte=int(self.value()))
+        return queryset
+
+
 class ProductAdmin(admin.ModelAdmin):
     list_display = (
         "name",
@@ -33,7 +52,7 @@ class ProductAdmin(admin.ModelAdmin):
         "avg_rating_display",
         "created_at",
     )
-    list_filter = ("category", "is_available")
+    list_filter = ("category", "is_available", RatingFilter)
     search_fields = ("name", "description")
     prepopulated_fields = {"slug": ("name",)}
     inlines = [ProductImageInline, ReviewInline]
@@ -47,12 +66,12 @@ class ProductAdmin(admin.ModelAdmin):
     discounted_price_display.short_description = "Price"
 
     def avg_rating_display(self, obj):
-        avg = obj.average_rating
-        if avg > 0:
-            return f"{avg:.1f}/5.0 ({obj.reviews.count()} reviews)"
+        if obj.rating_count:
+            return f"{obj.rating_avg:.1f}/5.0 ({obj.rating_count} reviews)"
         return "No ratings"
 
     avg_rating_display.short_description = "Rating"
+    avg_rating_display.admin_order_field = "rating_avg"
 
 
 class CategoryAdmin(admin.ModelAdmin):
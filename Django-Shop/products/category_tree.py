@@ -0,0 +1,147 @@
+"""Cached, immutable view of the whole category hierarchy.
+
+The category table is small and read on every page (navbar menu, product
+list filters), so it is loaded in one query and kept as a tree of frozen
+nodes. The tree is cached in process and in the Django cache under a version
+number that ``products.signals`` bumps whenever a category is saved or
+deleted; each process compares its copy against that version on access.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Optional
+
+from django.core.cache import cache
+
+from config.caching import cached_computation
+
+VERSION_KEY = "category-tree:version"
+TREE_KEY = "category-tree:{version}"
+TREE_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    id: int
+    name: str
+    slug: str
+    parent_id: Optional[int]
+    is_active: bool
+    path: str
+    children: tuple = field(default=(), compare=False, repr=False)
+
+    @property
+    def is_parent(self):
+        """A top-level category (mirrors ``Category.is_parent``)"""
+        return self.parent_id is None
+
+    @property
+    def active_children(self):
+        return tuple(child for child in self.children if child.is_active)
+
+
+class CategoryTree:
+    """All categories as nested ``CategoryNode`` objects with lookup maps."""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        child_ids = {}
+        for row in rows:
+            child_ids.setdefault(row["parent_id"], []).append(row["id"])
+        by_row_id = {row["id"]: row for row in rows}
+
+        nodes = {}
+
+        def build(category_id):
+            row = by_row_id[category_id]
+            children = tuple(build(child) for child in child_ids.get(category_id, ()))
+            nodes[category_id] = CategoryNode(children=children, **row)
+            return nodes[category_id]
+
+        self.roots = tuple(
+            build(category_id) for category_id in child_ids.get(None, ())
+        )
+        self.by_id = MappingProxyType(nodes)
+        self.by_slug = MappingProxyType({node.slug: node for node in nodes.values()})
+
+    @staticmethod
+    def load_rows():
+        from .models import Category
+
+        return list(
+            Category.objects.order_by("name").values(
+                "id", "name", "slug", "parent_id", "is_active", "path"
+            )
+        )
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def parent(self, node):
+        return self.by_id.get(node.parent_id)
+
+    def ancestors(self, node):
+        """Ancestors of the node, root first (for breadcrumbs)."""
+        ancestors = []
+        parent = self.parent(node)
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self.parent(parent)
+        return ancestors[::-1]
+
+    def descendants(self, node, active=False):
+        """Every node below this one, at any depth.
+
+        With ``active``, inactive nodes are skipped along with everything
+        below them.
+        """
+        for child in node.children:
+            if active and not child.is_active:
+                continue
+            yield child
+            yield from self.descendants(child, active)
+
+    def siblings(self, node, active=True):
+        """Other children of the node's parent."""
+        parent = self.parent(node)
+        if parent is None:
+            return ()
+        children = parent.active_children if active else parent.children
+        return tuple(child for child in children if child.id != node.id)
+
+    def menu(self):
+        """Active top-level categories mapped to their active children."""
+        return {root: root.active_children for root in self.roots if root.is_active}
+
+
+_local_tree = {"version": None, "tree": None}
+_lock = threading.Lock()
+
+
+def get_category_tree() -> CategoryTree:
+    """Return the current tree: from this process, the Django cache, or the DB."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = bump_category_tree_version()
+
+    with _lock:
+        if _local_tree["version"] == version:
+            return _local_tree["tree"]
+
+    # The shared cache holds the raw rows; each process builds its own nodes
+    tree_key = TREE_KEY.format(version=version)
+    rows = cached_computation(tree_key, CategoryTree.load_rows, TREE_TIMEOUT)
+    tree = CategoryTree(rows)
+
+    with _lock:
+        _local_tree.update(version=version, tree=tree)
+    return tree
+
+
+def bump_category_tree_version():
+    """Invalidate every cached copy of the tree (called on Category changes)."""
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, None)
+    return version
@@ -0,0 +1,100 @@
+"""Conditional GET (ETag / Last-Modified) for the product pages.
+
+Validators are cheap to compute: the catalog version (bumped on every
+catalog change, see ``products.page_cache``), and for a product page its
+``updated_at`` and latest review timestamp, read with the product itself
+(which the view then reuses). An unchanged
+page is answered with 304 before the view builds any context.
+
+The pages are also personal (cart badge, wishlist hearts, logged-in user), so
+the ETag covers the visitor's state too. Last-Modified cannot: it is only
+sent to visitors without any such state (anonymous, no cart), whose page
+changes with the catalog alone.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from django.contrib.messages import get_messages
+from django.views.decorators.http import condition
+
+from cart.models import Cart
+from users.models import Wishlist
+
+from .page_cache import get_catalog_version
+from .views import get_detail_product
+
+
+def catalog_modified():
+    """When the catalog last changed (its version is a ``time_ns`` stamp)."""
+    return datetime.fromtimestamp(get_catalog_version() / 1e9, tz=timezone.utc)
+
+
+def product_freshness(request, slug):
+    """``(updated_at, latest review)`` of the product, None if it does not exist."""
+    product = get_detail_product(request, slug)
+    if product is None:
+        return None
+    return product.updated_at, product.latest_review
+
+
+def has_pending_messages(request):
+    # Flash messages are shown once, so a page carrying them is never reused
+    return bool(len(get_messages(request)))
+
+
+def visitor_state(request):
+    """What makes the page differ between visitors (memoized for the view)."""
+    summary = Cart.summary_for_request(request)
+    # The CSRF secret only rotates on login/logout, which the user id covers
+    return [
+        request.user.pk,
+        summary["total_quantity"] if summary else 0,
+        sorted(Wishlist.product_ids_for_request(request)),
+    ]
+
+
+def is_personal(request):
+    return (
+        request.user.is_authenticated or Cart.summary_for_request(request) is not None
+    )
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def product_list_etag(request):
+    if has_pending_messages(request):
+        return None
+    return make_etag(get_catalog_version(), visitor_state(request))
+
+
+def product_list_last_modified(request):
+    if has_pending_messages(request) or is_personal(request):
+        return None
+    return catalog_modified()
+
+
+def product_detail_etag(request, slug):
+    freshness = product_freshness(request, slug)
+    if freshness is None or has_pending_messages(request):
+        return None
+    return make_etag(get_catalog_version(), freshness, visitor_state(request))
+
+
+def product_detail_last_modified(request, slug):
+    if has_pending_messages(request) or is_personal(request):
+        return None
+    freshness = product_freshness(request, slug)
+    if freshness is None:
+        return None
+    return max(filter(None, (*freshness, catalog_modified())))
+
+
+product_list_condition = condition(
+    etag_func=product_list_etag, last_modified_func=product_list_last_modified
+)
+product_detail_condition = condition(
+    etag_func=product_detail_etag, last_modified_func=product_detail_last_modified
+)
@@ -0,0 +1,20 @@
+from django.utils.functional import SimpleLazyObject
+
+from products.page_cache import (
+    CSRF_PLACEHOLDER,
+    get_catalog_version,
+    rendering_placeholders,
+)
+
+
+def page_cache_processor(request):
+    """
+    Context processor for the catalog page cache.
+    Exposes ``catalog_version`` for ``{% cache %}`` fragment keys and, while a
+    page is rendered for the shared cache, replaces the CSRF token with a
+    placeholder (filled in per request by ``products.page_cache``).
+    """
+    context = {"catalog_version": SimpleLazyObject(get_catalog_version)}
+    if rendering_placeholders(request):
+        context["csrf_token"] = CSRF_PLACEHOLDER
+    return context
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized product rating aggregates from reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products updated per UPDATE statement",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        updated = 0
+        # Update in primary-key ranges to keep each statement (and its locks) short
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            updated += Product.rebuild_rating_aggregates(
+                Product.objects.filter(pk__gte=batch[0], pk__lte=batch[-1])
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} products.")
+        )
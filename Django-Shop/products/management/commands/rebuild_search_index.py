@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from the catalog."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {type(backend).__name__} index ({indexed} products)."
+            )
+        )
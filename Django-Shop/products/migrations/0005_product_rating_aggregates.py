@@ -0,0 +1,44 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:04
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Review = apps.get_model("products", "Review")
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    Product.objects.update(
+        rating_count=Coalesce(Subquery(reviews.annotate(c=Count("pk")).values("c")), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum("rating")).values("s")), 0),
+        rating_avg=Coalesce(
+            Subquery(reviews.annotate(a=Avg(Cast("rating", FloatField()))).values("a")),
+            Value(0.0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_alter_review_comment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
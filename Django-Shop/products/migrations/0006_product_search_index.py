@@ -0,0 +1,55 @@
+from django.db import migrations
+
+SQLITE_TABLE = "products_product_fts"
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(p.description, '')), 'C')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+            "USING fts5(name, description, category, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) "
+            "SELECT p.id, p.name, p.description, c.name "
+            "FROM products_product p JOIN products_category c ON c.id = p.category_id"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_search_idx "
+            "ON products_product USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            f"UPDATE products_product p SET search_vector = {POSTGRES_VECTOR} "
+            "FROM products_category c WHERE c.id = p.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS products_product_search_idx")
+        schema_editor.execute(
+            "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_product_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
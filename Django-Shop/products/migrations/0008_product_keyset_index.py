@@ -0,0 +1,22 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="product",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="product_created_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    children = {}
+    for pk, parent_id in Category.objects.values_list("pk", "parent_id"):
+        children.setdefault(parent_id, []).append(pk)
+
+    paths = {}
+    pending = [(pk, "") for pk in children.get(None, [])]
+    while pending:
+        pk, parent_path = pending.pop()
+        paths[pk] = f"{parent_path}{pk}/"
+        pending += [(child, paths[pk]) for child in children.get(pk, [])]
+
+    for pk, path in paths.items():
+        Category.objects.filter(pk=pk).update(path=path)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.14 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_category_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="is_primary",
+            field=models.BooleanField(
+                default=False, help_text="Use as the product's cover image on cards"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productimage",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_primary", True)),
+                fields=("product",),
+                name="uniq_primary_image_per_product",
+            ),
+        ),
+    ]
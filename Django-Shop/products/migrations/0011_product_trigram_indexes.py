@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in ("name", "description"):
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS products_product_{column}_trgm_idx "
+            f"ON products_product USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in ("name", "description"):
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS products_product_{column}_trgm_idx"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_productimage_is_primary"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -8,7 +8,18 @@ from django.core.validators import (
     MaxValueValidator,
     MinValueValidator,
 )
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Avg,
+    Count,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, Substr
 from django.utils.text import slugify
 
 
@@ -32,11 +43,58 @@ class Category(models.Model):
         "self", on_delete=models.CASCADE, null=True, blank=True, related_name="children"
     )
     is_active = models.BooleanField(default=True)
+    # Materialized path of ancestor ids, root first: "3/17/42/" (this category is 42)
+    path = models.CharField(max_length=255, db_index=True, editable=False, default="")
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        old_path = self.path
+        if self.pk is not None:
+            self.path = self.build_path()
+            if self.path != old_path and old_path and self.path.startswith(old_path):
+                raise ValidationError("A category cannot be moved under itself.")
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and self.path != old_path:
+                kwargs["update_fields"] = {*update_fields, "path"}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.path:
+                # New rows only know their id after the insert
+                self.path = self.build_path()
+                Category.objects.filter(pk=self.pk).update(path=self.path)
+            elif old_path and old_path != self.path:
+                # Re-parented: move the whole subtree with a single UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(
+                    pk=self.pk
+                ).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1))
+                )
+
+    def build_path(self):
+        parent_path = self.parent.path if self.parent_id else ""
+        return f"{parent_path}{self.pk}/"
+
+    def clean(self):
+        if self.pk and self.parent_id and self.parent.path.startswith(self.path):
+            raise ValidationError(
+                {"parent": "A category cannot be moved under itself."}
+            )
+
+    @property
+    def ancestor_ids(self):
+        """Ids of the ancestors, root first (parsed from ``path``, no query)."""
+        return [int(part) for part in self.path.split("/")[:-2]]
+
+    def get_ancestors(self):
+        """All ancestors, root first, in a single query."""
+        ancestors = Category.objects.in_bulk(self.ancestor_ids)
+        return [ancestors[pk] for pk in self.ancestor_ids if pk in ancestors]
+
+    def get_descendants(self):
+        """Every category below this one, at any depth."""
+        return Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk)
 
     def __str__(self):
         if self.parent:
@@ -58,6 +116,40 @@ class Category(models.Model):
         return self.children.exists()
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_card_data(self):
+        """Everything a product card renders, in a constant number of queries.
+
+        Joins the category and annotates ``primary_image_name`` (the cover
+        image, else the first uploaded one); rating aggregates are columns.
+        """
+        primary_image = (
+            ProductImage.objects.filter(product=OuterRef("pk"))
+            .order_by("-is_primary", "pk")
+            .values("image")[:1]
+        )
+        return self.select_related("category").annotate(
+            primary_image_name=Subquery(primary_image)
+        )
+
+    def with_detail_data(self):
+        """Card data plus what the detail page shows, for one product.
+
+        Adds the parent category and ``latest_review``, the last review
+        change that the page's ETag depends on.
+        """
+        latest_review = (
+            Review.objects.filter(product=OuterRef("pk"))
+            .order_by("-updated_at")
+            .values("updated_at")[:1]
+        )
+        return (
+            self.with_card_data()
+            .select_related("category__parent")
+            .annotate(latest_review=Subquery(latest_review))
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=150, unique=True)
     slug = models.SlugField(max_length=160, unique=True, blank=True, null=True)
@@ -77,19 +169,43 @@ class Product(models.Model):
         Category, on_delete=models.CASCADE, related_name="products"
     )
     is_available = models.BooleanField(default=True)
+    # Denormalized review aggregates, kept in sync by products.signals
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    RATING_FIELDS = ("rating_count", "rating_sum", "rating_avg")
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            # Reviews update the rating aggregates in SQL; the values loaded on
+            # this instance may be stale, so only an explicit update writes them
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Supports the keyset pagination of the product list
+            models.Index(fields=["-created_at", "-id"], name="product_created_id_idx"),
+        ]
 
     @property
     def discounted_price(self):
@@ -104,13 +220,64 @@ class Product(models.Model):
         """Check if product has a discount"""
         return self.discount_percent > 0
 
+    @property
+    def primary_image_url(self):
+        """URL of the cover image (annotated by ``with_card_data`` when available)."""
+        if hasattr(self, "primary_image_name"):
+            name = self.primary_image_name
+        else:
+            image = self.images.order_by("-is_primary", "pk").first()
+            name = image.image.name if image else None
+        if not name:
+            return ""
+        return ProductImage._meta.get_field("image").storage.url(name)
+
     @property
     def average_rating(self):
-        """Calculate average rating for this product"""
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / reviews.count()
-        return 0
+        """Average rating for this product (denormalized, see ``rating_avg``)"""
+        return self.rating_avg
+
+    @classmethod
+    def apply_rating_change(cls, product_id, count_delta, sum_delta):
+        """Apply an incremental change to a product's rating aggregates.
+
+        Runs as a single UPDATE so concurrent reviews never lose increments.
+        """
+        count = F("rating_count") + count_delta
+        total = F("rating_sum") + sum_delta
+        cls.objects.filter(pk=product_id).update(
+            rating_count=count,
+            rating_sum=total,
+            rating_avg=Coalesce(
+                Cast(total, FloatField()) / NullIf(count, 0), Value(0.0)
+            ),
+        )
+
+    @classmethod
+    def rebuild_rating_aggregates(cls, queryset=None):
+        """Recompute rating aggregates from the reviews table.
+
+        Returns the number of products updated.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        reviews = (
+            Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+        )
+        return queryset.update(
+            rating_count=Coalesce(
+                Subquery(reviews.annotate(c=Count("pk")).values("c")), 0
+            ),
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(s=Sum("rating")).values("s")), 0
+            ),
+            rating_avg=Coalesce(
+                Subquery(
+                    reviews.annotate(a=Avg(Cast("rating", FloatField()))).values("a")
+                ),
+                Value(0.0),
+            ),
+        )
 
 
 class ProductImage(models.Model):
@@ -124,6 +291,18 @@ class ProductImage(models.Model):
             validate_image_size,
         ],
     )
+    is_primary = models.BooleanField(
+        default=False, help_text="Use as the product's cover image on cards"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product"],
+                condition=models.Q(is_primary=True),
+                name="uniq_primary_image_per_product",
+            )
+        ]
 
     def __str__(self):
         return f"{self.product.name} Image"
@@ -151,3 +330,10 @@ class Review(models.Model):
 
     def __str__(self):
         return f"{self.user.email} rated {self.product.name} {self.rating} stars"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored rating so updates can apply a delta to the product
+        instance._loaded_rating = instance.__dict__.get("rating")
+        return instance
@@ -0,0 +1,141 @@
+"""Whole-page cache for anonymous catalog pages.
+
+Anonymous visitors all see the same home page, product list and product
+detail, so ``cache_anonymous_page`` stores the rendered HTML keyed on the
+path, the query parameters the view reads and a catalog version. ``products.signals`` bumps the
+version whenever a product, image, review or category changes, which retires
+every cached page (and ``{% cache %}`` fragment keyed on ``catalog_version``)
+at once.
+
+Per-visitor pieces are left out of the stored HTML: while a cacheable page
+renders, ``{% csrf_token %}`` outputs ``CSRF_PLACEHOLDER`` and
+``{% personalized %}`` outputs a marker instead of its template. Both are
+filled in for each request, whether the page came from the cache or not.
+"""
+
+import hashlib
+import re
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+VERSION_KEY = "catalog:version"
+PAGE_KEY = "catalog-page:{version}:{variant}:{path}"
+CSRF_PLACEHOLDER = "__csrf_token_placeholder__"
+PERSONALIZED_MARKER = "<!--personalized:{template}-->"
+PERSONALIZED_RE = re.compile(r"<!--personalized:([\w./-]+)-->")
+
+
+def get_catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = bump_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page and fragment."""
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def rendering_placeholders(request) -> bool:
+    """Whether the page being rendered is going to the shared cache."""
+    return getattr(request, "page_cache_placeholders", False)
+
+
+def is_cacheable(request) -> bool:
+    if request.method not in ("GET", "HEAD") or not settings.PAGE_CACHE_TIMEOUT:
+        return False
+    if request.user.is_authenticated:
+        return False
+    # A page rendered now would show (and consume) a flash message
+    return not len(get_messages(request))
+
+
+def page_key(request, version, params=(), freshness=None):
+    """Cache key of the page; only the query ``params`` the view reads vary it.
+
+    Anything else in the query string (tracking tags, cache busters) maps to
+    the same entry, so it cannot be used to fill the cache with copies.
+    ``freshness`` is folded in too, for pages that change without a catalog
+    version bump.
+    """
+    ajax = request.headers.get("X-Requested-With", "").lower() == "xmlhttprequest"
+    query = urlencode([(name, request.GET.getlist(name)) for name in params], True)
+    path = hashlib.md5(f"{request.path}?{query}#{freshness!r}".encode()).hexdigest()
+    return PAGE_KEY.format(
+        version=version, variant="ajax" if ajax else "page", path=path
+    )
+
+
+def fill_personalized(request, content: str) -> str:
+    """Replace the placeholders of a cached page for this request."""
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return PERSONALIZED_RE.sub(
+        lambda match: render_to_string(match.group(1), request=request), content
+    )
+
+
+def cache_anonymous_page(view, params=(), freshness=None):
+    """Serve anonymous GET requests of ``view`` from the page cache.
+
+    ``params`` names the query parameters that change the page, and
+    ``freshness(request, *args, **kwargs)``, if given, returns what else the
+    key depends on (a product's ``updated_at``, which stock changes stamp
+    without bumping the catalog version). Only 200 responses are stored, for
+    ``PAGE_CACHE_TIMEOUT`` seconds; cookies and other per-response headers
+    are never stored.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable(request):
+            return view(request, *args, **kwargs)
+
+        key = page_key(
+            request,
+            get_catalog_version(),
+            params,
+            freshness(request, *args, **kwargs) if freshness else None,
+        )
+        cached = cache.get(key)
+        if cached is None:
+            request.page_cache_placeholders = True
+            try:
+                response = view(request, *args, **kwargs)
+                if callable(getattr(response, "render", None)):
+                    response.render()
+            finally:
+                request.page_cache_placeholders = False
+            if response.streaming:
+                return response
+            if response.status_code != 200:
+                response.content = fill_personalized(
+                    request, response.content.decode(response.charset)
+                )
+                return response
+            cached = {
+                "content": response.content.decode(response.charset),
+                "headers": {
+                    name: response[name]
+                    for name in ("Content-Type", "X-Has-More", "X-Next-Cursor")
+                    if response.has_header(name)
+                },
+            }
+            cache.set(key, cached, settings.PAGE_CACHE_TIMEOUT)
+
+        return HttpResponse(
+            fill_personalized(request, cached["content"]), headers=cached["headers"]
+        )
+
+    return wrapper
@@ -0,0 +1,44 @@
+"""Keyset (cursor) pagination for the product list.
+
+Products are ordered by ``(-created_at, -id)``; a cursor encodes the sort key
+of the last product on a page, and the next page is the rows strictly after
+it. Unlike OFFSET pagination this doesn't get slower on later pages and needs
+no ``COUNT(*)``: one extra row is fetched to know whether more pages exist.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(product) -> str:
+    value = f"{product.created_at.isoformat()}|{product.pk}"
+    return urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return ``(created_at, id)`` for a cursor, or raise Http404 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError) as e:
+        raise Http404("Invalid cursor") from e
+
+
+def keyset_page(queryset, cursor, page_size):
+    """Return ``(products, has_more, next_cursor)`` for the page after ``cursor``."""
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    products = list(queryset[: page_size + 1])
+    has_more = len(products) > page_size
+    products = products[:page_size]
+    next_cursor = encode_cursor(products[-1]) if has_more else None
+    return products, has_more, next_cursor
@@ -0,0 +1,214 @@
+"""Pluggable product search backends.
+
+A backend turns a free-text query into a filtered, relevance-ranked product
+queryset and keeps its own index in sync with the catalog. The backend is
+chosen by the ``PRODUCT_SEARCH_BACKEND`` setting (a dotted path); when unset it
+is picked from the database vendor:
+
+- SQLite: an FTS5 virtual table with the trigram tokenizer (substring matches).
+- PostgreSQL: a weighted ``tsvector`` column with a GIN index, plus
+  ``pg_trgm`` indexes for substring matches.
+- Anything else: plain ``icontains`` filtering.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+class DatabaseSearchBackend:
+    """Portable fallback: case-insensitive substring match, no ranking."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(description__icontains=query)
+            | Q(category__name__icontains=query)
+        )
+
+    def index_products(self, product_ids):
+        """(Re)index the given products. No-op for the fallback backend."""
+
+    def remove_products(self, product_ids):
+        """Drop the given products from the index. No-op for the fallback backend."""
+
+    def rebuild(self):
+        """Rebuild the whole index. Returns the number of indexed products."""
+        return 0
+
+
+class SQLiteSearchBackend(DatabaseSearchBackend):
+    """FTS5 search over product name, description and category name.
+
+    The trigram tokenizer keeps the substring semantics of ``icontains`` while
+    answering from the index. Terms shorter than three characters cannot be
+    looked up in a trigram index, so such queries use the fallback.
+    """
+
+    table = "products_product_fts"
+    min_term_length = 3
+    # bm25 column weights: name, description, category
+    weights = (10.0, 1.0, 5.0)
+
+    def search(self, queryset, query):
+        terms = query.split()
+        if not terms or any(len(term) < self.min_term_length for term in terms):
+            return super().search(queryset, query)
+
+        # Quote every term so FTS5 syntax characters are matched literally
+        match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        weights = ", ".join(str(weight) for weight in self.weights)
+        product_table = queryset.model._meta.db_table
+        return (
+            queryset.filter(
+                pk__in=RawSQL(
+                    f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s",
+                    [match],
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"SELECT bm25({self.table}, {weights}) FROM {self.table} "
+                    f'WHERE {self.table} MATCH %s AND rowid = "{product_table}"."id"',
+                    [match],
+                )
+            )
+            # bm25 scores are negative: lower is more relevant
+            .order_by("search_rank", "-created_at", "-id")
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, description, category) "
+                "SELECT p.id, p.name, p.description, c.name "
+                "FROM products_product p "
+                "JOIN products_category c ON c.id = p.category_id "
+                f"WHERE p.id IN ({placeholders})",
+                product_ids,
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, description, category) "
+                "SELECT p.id, p.name, p.description, c.name "
+                "FROM products_product p "
+                "JOIN products_category c ON c.id = p.category_id"
+            )
+            return cursor.rowcount
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    """Full-text search on a weighted ``search_vector`` column (GIN indexed).
+
+    Terms are prefix-matched against whole words, and the query is also
+    matched as a substring of the name, description and category name
+    through ``pg_trgm`` GIN indexes, so ``widget`` finds ``SuperWidget`` as
+    it does with the SQLite trigram index. Substring-only matches rank last.
+    """
+
+    config = "english"
+    vector_sql = (
+        "setweight(to_tsvector('{config}', coalesce(p.name, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce(c.name, '')), 'B') || "
+        "setweight(to_tsvector('{config}', coalesce(p.description, '')), 'C')"
+    )
+
+    def _tsquery(self, query):
+        terms = re.findall(r"\w+", query)
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def _like_pattern(self, query):
+        escaped = re.sub(r"([\\%_])", r"\\\1", query.strip())
+        return f"%{escaped}%"
+
+    def search(self, queryset, query):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return super().search(queryset, query)
+
+        product_table = queryset.model._meta.db_table
+        pattern = self._like_pattern(query)
+        # One indexed branch per column; UNION lets each use its own index
+        matches = (
+            f"SELECT id FROM {product_table} "
+            f"WHERE search_vector @@ to_tsquery('{self.config}', %s) "
+            f"UNION SELECT id FROM {product_table} WHERE name ILIKE %s "
+            f"UNION SELECT id FROM {product_table} WHERE description ILIKE %s "
+            f"UNION SELECT p.id FROM {product_table} p "
+            "JOIN products_category c ON c.id = p.category_id "
+            "WHERE c.name ILIKE %s"
+        )
+        return (
+            queryset.filter(
+                pk__in=RawSQL(matches, [tsquery, pattern, pattern, pattern])
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f'ts_rank("{product_table}".search_vector, '
+                    f"to_tsquery('{self.config}', %s))",
+                    [tsquery],
+                )
+            )
+            .order_by("-search_rank", "-created_at", "-id")
+        )
+
+    def _update_vectors(self, where="", params=()):
+        vector = self.vector_sql.format(config=self.config)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE products_product p SET search_vector = {vector} "
+                f"FROM products_category c WHERE c.id = p.category_id {where}",
+                params,
+            )
+            return cursor.rowcount
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self._update_vectors("AND p.id = ANY(%s)", [product_ids])
+
+    def rebuild(self):
+        return self._update_vectors()
+
+
+_VENDOR_BACKENDS = {
+    "sqlite": "products.search.SQLiteSearchBackend",
+    "postgresql": "products.search.PostgresSearchBackend",
+}
+_backends = {}
+
+
+def get_search_backend():
+    """Return the configured search backend instance (one per dotted path)."""
+    path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None) or _VENDOR_BACKENDS.get(
+        connection.vendor, "products.search.DatabaseSearchBackend"
+    )
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
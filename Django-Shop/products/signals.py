@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .category_tree import bump_category_tree_version
+from .models import Category, Product, ProductImage, Review
+from .page_cache import bump_catalog_version
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance: Review, created, **kwargs):
+    """Keep Product rating aggregates in sync, inside the saving transaction."""
+    if created:
+        Product.apply_rating_change(instance.product_id, 1, instance.rating)
+    else:
+        previous = getattr(instance, "_loaded_rating", None)
+        if previous is None:
+            Product.rebuild_rating_aggregates(
+                Product.objects.filter(pk=instance.product_id)
+            )
+        elif previous != instance.rating:
+            Product.apply_rating_change(
+                instance.product_id, 0, instance.rating - previous
+            )
+    instance._loaded_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance: Review, origin=None, **kwargs):
+    # Reviews cascading from a product deletion have nothing left to update
+    if isinstance(origin, Product) or getattr(origin, "model", None) is Product:
+        return
+    rating = getattr(instance, "_loaded_rating", None) or instance.rating
+    Product.apply_rating_change(instance.product_id, -1, -rating)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance: Product, **kwargs):
+    get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance: Product, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance: Category, created, **kwargs):
+    # The category name is part of every product's search document
+    if not created:
+        get_search_backend().index_products(
+            instance.products.values_list("pk", flat=True)
+        )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, instance: Category, **kwargs):
+    bump_category_tree_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_pages(sender, **kwargs):
+    bump_catalog_version()
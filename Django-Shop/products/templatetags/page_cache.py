@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from products.page_cache import PERSONALIZED_MARKER, rendering_placeholders
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personalized(context, template_name):
+    """Include a per-visitor template, or its marker when the page is cached."""
+    request = context.get("request")
+    if request is not None and rendering_placeholders(request):
+        return mark_safe(PERSONALIZED_MARKER.format(template=template_name))
+    with context.push():
+        return context.template.engine.get_template(template_name).render(context)
@@ -0,0 +1,44 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+
+from products.models import Product, ProductImage
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("no_page_cache")]
+
+
+def list_page_queries(client):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(reverse("products:index"))
+    assert resp.status_code == 200
+    return len(ctx.captured_queries)
+
+
+def test_product_list_query_count_does_not_grow_with_cards(client, product_factory):
+    def add_products(count):
+        for _ in range(count):
+            product = product_factory()
+            baker.make(ProductImage, product=product, image="products/x.jpg")
+
+    add_products(2)
+    list_page_queries(client)  # warm the category tree cache
+    baseline = list_page_queries(client)
+    add_products(8)
+    assert list_page_queries(client) == baseline
+
+
+def test_primary_image_is_preferred_over_upload_order(product):
+    baker.make(ProductImage, product=product, image="products/first.jpg")
+    baker.make(
+        ProductImage, product=product, image="products/cover.jpg", is_primary=True
+    )
+
+    card = Product.objects.with_card_data().get(pk=product.pk)
+    assert card.primary_image_url.endswith("products/cover.jpg")
+    assert product.primary_image_url.endswith("products/cover.jpg")
+
+
+def test_product_without_images_has_empty_image_url(product):
+    assert Product.objects.with_card_data().get(pk=product.pk).primary_image_url == ""
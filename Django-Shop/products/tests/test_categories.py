@@ -0,0 +1,124 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.test import RequestFactory
+from django.urls import reverse
+from model_bakery import baker
+
+from products.category_tree import get_category_tree
+from products.context_processors.categories import categories_processor
+from products.models import Category
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def hierarchy():
+    electronics = baker.make(Category, name="Electronics", slug="electronics")
+    books = baker.make(Category, name="Books", slug="books")
+    laptops = baker.make(Category, name="Laptops", slug="laptops", parent=electronics)
+    phones = baker.make(Category, name="Phones", slug="phones", parent=electronics)
+    baker.make(Category, name="Retired", parent=electronics, is_active=False)
+    return electronics, books, laptops, phones
+
+
+def test_menu_is_built_from_one_query_and_then_cached(
+    hierarchy, django_assert_num_queries
+):
+    electronics, books, laptops, phones = hierarchy
+    request = RequestFactory().get("/")
+
+    with django_assert_num_queries(1):
+        menu = categories_processor(request)["categories_menu"]
+    with django_assert_num_queries(0):
+        categories_processor(request)
+
+    by_name = {node.name: children for node, children in menu.items()}
+    assert list(by_name) == ["Books", "Electronics"]
+    assert [c.name for c in by_name["Electronics"]] == ["Laptops", "Phones"]
+    assert by_name["Books"] == ()
+
+
+def test_category_changes_invalidate_the_tree(hierarchy):
+    electronics, books, laptops, phones = hierarchy
+    assert get_category_tree().get("phones").name == "Phones"
+
+    phones.name = "Smartphones"
+    phones.save()
+    assert get_category_tree().get("phones").name == "Smartphones"
+
+    books.delete()
+    assert get_category_tree().get("books") is None
+
+
+def test_list_view_uses_tree_for_parent_and_siblings(client, hierarchy):
+    resp = client.get(reverse("products:index"), {"category": "laptops"})
+    assert resp.context["parent_category"].slug == "electronics"
+    assert [c.slug for c in resp.context["sibling_categories"]] == ["phones"]
+
+    resp = client.get(reverse("products:index"), {"category": "electronics"})
+    assert [c.slug for c in resp.context["subcategories"]] == ["laptops", "phones"]
+
+    assert (
+        client.get(reverse("products:index"), {"category": "nope"}).status_code == 404
+    )
+
+
+# --- Materialized path tests ---
+
+
+def test_paths_follow_creation_and_reparenting(hierarchy):
+    electronics, books, laptops, phones = hierarchy
+    gaming = baker.make(Category, name="Gaming Laptops", parent=laptops)
+    assert electronics.path == f"{electronics.pk}/"
+    assert gaming.path == f"{electronics.pk}/{laptops.pk}/{gaming.pk}/"
+    assert [c.name for c in gaming.get_ancestors()] == ["Electronics", "Laptops"]
+
+    # Moving a category moves its whole subtree
+    laptops.parent = books
+    laptops.save()
+    gaming.refresh_from_db()
+    assert gaming.path == f"{books.pk}/{laptops.pk}/{gaming.pk}/"
+    assert set(books.get_descendants()) == {laptops, gaming}
+
+
+def test_category_cannot_move_under_its_descendant(hierarchy):
+    electronics, books, laptops, phones = hierarchy
+    electronics.parent = laptops
+    with pytest.raises(ValidationError):
+        electronics.save()
+
+
+def test_category_listing_includes_every_depth(client, hierarchy, product_factory):
+    electronics, books, laptops, phones = hierarchy
+    gaming = baker.make(Category, name="Gaming Laptops", parent=laptops)
+    deep = product_factory(name="DeepProduct", category=gaming)
+    product_factory(name="BookProduct", category=books)
+
+    resp = client.get(reverse("products:index"), {"category": "electronics"})
+    assert list(resp.context["products"]) == [deep]
+
+    # An inactive category hides its whole branch, active children included
+    laptops.is_active = False
+    laptops.save()
+    resp = client.get(reverse("products:index"), {"category": "electronics"})
+    assert list(resp.context["products"]) == []
+
+    resp = client.get(reverse("products:index"), {"category": gaming.slug})
+    assert [c.name for c in resp.context["category_ancestors"]] == [
+        "Electronics",
+        "Laptops",
+    ]
+
+
+def test_category_listing_follows_reparenting(client, hierarchy, product_factory):
+    electronics, books, laptops, phones = hierarchy
+    gaming = baker.make(Category, name="Gaming Laptops", parent=laptops)
+    deep = product_factory(name="DeepProduct", category=gaming)
+
+    laptops.parent = books
+    laptops.save()
+
+    resp = client.get(reverse("products:index"), {"category": "books"})
+    assert list(resp.context["products"]) == [deep]
+    resp = client.get(reverse("products:index"), {"category": "electronics"})
+    assert list(resp.context["products"]) == []
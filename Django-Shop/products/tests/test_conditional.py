@@ -0,0 +1,109 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+
+from orders.models import Order
+from products.models import Review
+from products.page_cache import get_catalog_version
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def detail_url(product):
+    return reverse("products:product_detail", args=[product.slug])
+
+
+def revalidate(client, url, response):
+    return client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+
+def test_product_pages_carry_validators(client, product, detail_url):
+    for url in (detail_url, reverse("products:index")):
+        response = client.get(url)
+        assert response.has_header("ETag")
+        assert response.has_header("Last-Modified")
+
+
+def test_unchanged_detail_page_is_not_modified(client, product, detail_url):
+    first = client.get(detail_url)
+
+    with CaptureQueriesContext(connection) as ctx:
+        second = revalidate(client, detail_url, first)
+
+    assert second.status_code == 304
+    assert second.content == b""
+    # No context was built: just the validator query
+    assert len(ctx.captured_queries) == 1
+
+
+def test_product_and_review_changes_invalidate_the_etag(client, product, detail_url):
+    first = client.get(detail_url)
+    product.name = "Renamed"
+    product.save()
+    second = revalidate(client, detail_url, first)
+    assert second.status_code == 200
+
+    baker.make(Review, product=product, rating=2)
+    assert revalidate(client, detail_url, second).status_code == 200
+
+
+def test_cart_changes_invalidate_the_visitors_etag(client, product, detail_url):
+    first = client.get(detail_url)
+    client.post(reverse("cart:add", args=[product.pk]), {"quantity": 1})
+
+    assert revalidate(client, detail_url, first).status_code == 200
+
+
+def test_logged_in_etag_follows_the_wishlist(client, user, product, detail_url):
+    client.force_login(user)
+    first = client.get(detail_url)
+    assert revalidate(client, detail_url, first).status_code == 304
+
+    user.wishlist.create(product=product)
+
+    assert revalidate(client, detail_url, first).status_code == 200
+
+
+def test_stock_taken_by_an_order_invalidates_only_its_page(
+    client, user, product, detail_url, django_capture_on_commit_callbacks
+):
+    list_url = reverse("products:index")
+    detail, listing = client.get(detail_url), client.get(list_url)
+    version = get_catalog_version()
+    order = baker.make(Order, user=user, total_amount=100)
+    order.items.create(product=product, quantity=2, price=product.price)
+    with django_capture_on_commit_callbacks(execute=True):
+        order.decrement_stock()
+
+    assert revalidate(client, detail_url, detail).status_code == 200
+    # The list shows no stock counts, so it and every other cache stay valid
+    assert revalidate(client, list_url, listing).status_code == 304
+    assert get_catalog_version() == version
+
+
+def test_personal_pages_carry_no_last_modified(client, user, product, detail_url):
+    client.post(reverse("cart:add", args=[product.pk]), {"quantity": 1})
+    assert not client.get(detail_url).has_header("Last-Modified")
+
+    client.force_login(user)
+    for url in (detail_url, reverse("products:index")):
+        response = client.get(url)
+        assert response.has_header("ETag")
+        assert not response.has_header("Last-Modified")
+
+
+def test_list_honours_if_modified_since(client, product):
+    url = reverse("products:index")
+    first = client.get(url)
+
+    response = client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+    assert response.status_code == 304
+
+
+def test_unknown_product_is_still_not_found(client):
+    response = client.get(reverse("products:product_detail", args=["missing"]))
+    assert response.status_code == 404
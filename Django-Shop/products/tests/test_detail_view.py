@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+
+from products.models import Review
+from users.models import Wishlist
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("no_page_cache")]
+
+
+def add_reviews(product, count):
+    reviewers = baker.make(get_user_model(), _quantity=count)
+    reviews = baker.make(
+        Review,
+        product=product,
+        user=iter(reviewers),
+        rating=4,
+        _quantity=count,
+    )
+    # Spread creation times so the newest-first order is deterministic
+    now = timezone.now()
+    for n, review in enumerate(reviews):
+        Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(days=n))
+    return reviews
+
+
+@pytest.fixture
+def detail_url(product):
+    return reverse("products:product_detail", args=[product.slug])
+
+
+def detail_queries(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+
+def test_reviews_are_paginated_with_their_total(client, product, detail_url):
+    reviews = add_reviews(product, 25)
+
+    first = client.get(detail_url)
+    last = client.get(detail_url, {"reviews_page": 3})
+
+    assert first.context["review_count"] == 25
+    assert first.context["reviews"] == reviews[:10]
+    assert last.context["reviews"] == reviews[20:]
+    assert last.context["reviews_page"].paginator.num_pages == 3
+    assert b"Page 3 of 3" in last.content
+
+
+def test_reviews_with_equal_timestamps_page_without_gaps(client, product, detail_url):
+    reviews = add_reviews(product, 25)
+    Review.objects.update(created_at=timezone.now())
+
+    pages = [
+        client.get(detail_url, {"reviews_page": n}).context["reviews"]
+        for n in (1, 2, 3)
+    ]
+
+    listed = [review.pk for page in pages for review in page]
+    assert listed == sorted((review.pk for review in reviews), reverse=True)
+
+
+@pytest.mark.parametrize("page", ["4", "0", "x"])
+def test_out_of_range_review_pages_are_not_found(client, product, detail_url, page):
+    add_reviews(product, 25)
+    assert client.get(detail_url, {"reviews_page": page}).status_code == 404
+
+
+def test_query_count_does_not_grow_with_reviews(client, user, product, detail_url):
+    client.force_login(user)
+    add_reviews(product, 2)
+    detail_queries(client, detail_url)  # warm the category tree cache
+    baseline = detail_queries(client, detail_url)
+
+    add_reviews(product, 30)
+
+    assert detail_queries(client, detail_url) == baseline
+
+
+def test_users_own_review_is_listed_first(client, user, product, detail_url):
+    add_reviews(product, 12)
+    own = baker.make(Review, product=product, user=user, rating=5)
+    Review.objects.filter(pk=own.pk).update(
+        created_at=timezone.now() - timedelta(days=99)
+    )
+    client.force_login(user)
+
+    first = client.get(detail_url)
+    second = client.get(detail_url, {"reviews_page": 2})
+
+    assert first.context["reviews"][0] == own
+    assert first.context["user_review"] == own
+    assert own not in second.context["reviews"]
+    assert second.context["user_review"] == own
+
+
+def test_wishlist_state_comes_from_one_query(client, user, product_factory):
+    product, related = product_factory(), product_factory()
+    Wishlist.objects.create(user=user, product=related)
+    client.force_login(user)
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("products:product_detail", args=[product.slug]))
+
+    assert response.context["in_wishlist"] is False
+    assert response.context["wishlist_product_ids"] == {related.pk}
+    wishlist_queries = [q for q in ctx.captured_queries if "users_wishlist" in q["sql"]]
+    assert len(wishlist_queries) == 1
@@ -0,0 +1,161 @@
+import re
+
+import pytest
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+
+from orders.models import Order
+from products.models import Category, Product, ProductImage, Review
+from products.page_cache import CSRF_PLACEHOLDER, get_catalog_version, is_cacheable
+from users.models import Wishlist
+
+pytestmark = pytest.mark.django_db
+
+TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+@pytest.fixture
+def detail_url(product):
+    return reverse("products:product_detail", args=[product.slug])
+
+
+def test_anonymous_pages_are_served_from_the_cache(client, product, detail_url):
+    first = client.get(detail_url)
+
+    with CaptureQueriesContext(connection) as ctx:
+        second = Client().get(detail_url)
+
+    assert second.status_code == 200
+    # Only the conditional GET validators hit the database
+    assert len(ctx.captured_queries) == 1
+    assert second.content.count(b"Add to Cart") == first.content.count(b"Add to Cart")
+
+
+def test_query_string_is_part_of_the_key(client, product_factory):
+    # Random descriptions or category names could contain "mug" and match too
+    category = baker.make(Category, name="Gifts")
+    product_factory(name="Blue mug", description="", category=category)
+    product_factory(name="Red hat", description="", category=category)
+    client.get(reverse("products:index"))
+
+    response = client.get(reverse("products:index"), {"q": "mug"})
+
+    assert b"Blue mug" in response.content
+    assert b"Red hat" not in response.content
+
+
+def test_unread_query_params_share_the_cached_page(client, product, detail_url):
+    client.get(detail_url)
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = Client().get(detail_url, {"utm_source": "mail", "x": "1"})
+    assert response.status_code == 200
+    assert len(ctx.captured_queries) == 1  # validators only, the page was cached
+
+    with CaptureQueriesContext(connection) as ctx:
+        Client().get(detail_url, {"reviews_page": "1"})
+    assert len(ctx.captured_queries) > 1
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda product: Product.objects.get(pk=product.pk).save(),
+        lambda product: baker.make(ProductImage, product=product, image="x.jpg"),
+        lambda product: baker.make(Review, product=product, rating=5),
+        lambda product: baker.make(Category),
+        lambda product: product.delete(),
+    ],
+)
+def test_catalog_changes_bump_the_version(product, change):
+    version = get_catalog_version()
+    change(product)
+    assert get_catalog_version() != version
+
+
+def test_product_change_shows_up_on_cached_pages(client, product, detail_url):
+    client.get(detail_url)
+    product.name = "Renamed lamp"
+    product.save()
+
+    assert b"Renamed lamp" in Client().get(detail_url).content
+
+
+def test_stock_change_shows_up_on_the_cached_detail_page(
+    client, user, product, detail_url
+):
+    client.get(detail_url)
+    order = baker.make(Order, user=user, total_amount=100)
+    order.items.create(product=product, quantity=3, price=product.price)
+    order.decrement_stock()
+
+    response = Client().get(detail_url)
+
+    assert f"({product.stock - 3} available)".encode() in response.content
+
+
+def test_each_visitor_gets_a_working_csrf_token(product, detail_url):
+    Client().get(detail_url)  # fills the cache
+    visitor = Client(enforce_csrf_checks=True)
+
+    page = visitor.get(detail_url).content.decode()
+    assert CSRF_PLACEHOLDER not in page
+    token = TOKEN_RE.search(page).group(1)
+
+    response = visitor.post(
+        reverse("cart:add", args=[product.pk]),
+        {"quantity": 1, "csrfmiddlewaretoken": token},
+    )
+    assert response.status_code == 302
+
+
+def test_cart_badge_is_filled_in_per_visitor(product):
+    Client().get(reverse("home:index"))  # cached with an empty badge
+    shopper = Client()
+    shopper.post(reverse("cart:add", args=[product.pk]), {"quantity": 2})
+
+    assert b"cartBadgeCount" in shopper.get(reverse("home:index")).content
+    assert b"cartBadgeCount" not in Client().get(reverse("home:index")).content
+
+
+def test_logged_in_users_bypass_the_page_cache(client, user, product, detail_url):
+    Client().get(detail_url)
+    client.force_login(user)
+
+    response = client.get(detail_url)
+
+    assert response.context["product"] == product
+    assert b"Sign in</a> to leave a review" not in response.content
+
+
+def test_pages_with_pending_messages_are_not_cached(rf):
+    request = rf.get("/")
+    request.user = AnonymousUser()
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    assert is_cacheable(request)
+
+    messages.info(request, "You have signed out.")
+
+    assert not is_cacheable(request)
+
+
+def test_wishlist_hearts_stay_personal_with_cached_cards(user, product_factory):
+    product = product_factory()
+    other = baker.make(
+        get_user_model(), email="other@example.com", phone="+15550000002"
+    )
+    Wishlist.objects.create(user=user, product=product)
+    first, second = Client(), Client()
+    first.force_login(user)
+    second.force_login(other)
+
+    assert b"bi-heart-fill" in first.get(reverse("products:index")).content
+    assert b"bi-heart-fill" not in second.get(reverse("products:index")).content
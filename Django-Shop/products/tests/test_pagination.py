@@ -0,0 +1,51 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+pytestmark = pytest.mark.django_db
+
+
+def ajax_get(client, **params):
+    return client.get(
+        reverse("products:index"), params, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+    )
+
+
+def test_cursor_pages_cover_every_product_once(client, product_factory):
+    products = [product_factory(name=f"Item {n}") for n in range(30)]
+
+    resp = client.get(reverse("products:index"))
+    seen = [p.pk for p in resp.context["products"]]
+    assert resp.context["has_more"] is True
+    cursor = resp.context["next_cursor"]
+
+    while cursor:
+        resp = ajax_get(client, cursor=cursor)
+        assert resp.status_code == 200
+        seen += [p.pk for p in resp.context["products"]]
+        cursor = resp["X-Next-Cursor"]
+        assert resp["X-Has-More"] == ("true" if cursor else "false")
+
+    assert seen == [p.pk for p in reversed(products)]
+
+
+def test_ajax_cursor_page_skips_count_query(client, product_factory):
+    for n in range(15):
+        product_factory(name=f"Item {n}")
+    cursor = client.get(reverse("products:index")).context["next_cursor"]
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = ajax_get(client, cursor=cursor)
+    assert len(resp.context["products"]) == 3
+    assert not any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries)
+
+
+def test_page_numbers_and_invalid_cursors(client, product_factory):
+    for n in range(14):
+        product_factory(name=f"Item {n}")
+    resp = client.get(reverse("products:index"), {"page": 2})
+    assert len(resp.context["products"]) == 2
+    assert resp.context["has_more"] is False
+
+    assert ajax_get(client, cursor="not-a-cursor").status_code == 404
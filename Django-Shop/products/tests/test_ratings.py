@@ -0,0 +1,67 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from model_bakery import baker
+
+from products.models import Product, Review
+
+pytestmark = pytest.mark.django_db
+
+
+def rating_state(product):
+    product.refresh_from_db()
+    return product.rating_count, product.rating_sum, product.rating_avg
+
+
+def test_review_create_update_delete_keep_aggregates_in_sync(client, user, product):
+    client.force_login(user)
+    url = reverse("products:add_review", args=[product.slug])
+
+    client.post(url, {"rating": 4, "comment": "Nice"})
+    assert rating_state(product) == (1, 4, 4.0)
+
+    other = baker.make(Review, product=product, rating=1)
+    assert rating_state(product) == (2, 5, 2.5)
+
+    # Updating an existing review applies only the delta
+    client.post(url, {"rating": 2, "comment": "Changed my mind"})
+    assert rating_state(product) == (2, 3, 1.5)
+
+    review = Review.objects.get(product=product, user=user)
+    client.post(reverse("products:delete_review", args=[review.id]))
+    assert rating_state(product) == (1, 1, 1.0)
+
+    other.delete()
+    assert rating_state(product) == (0, 0, 0.0)
+    assert product.average_rating == 0
+
+
+def test_editing_a_product_keeps_ratings_added_since_it_was_loaded(product):
+    stale = Product.objects.get(pk=product.pk)
+    baker.make(Review, product=product, rating=5)
+
+    stale.name = "Edited in the admin"
+    stale.save()
+
+    assert rating_state(product) == (1, 5, 5.0)
+    assert product.name == "Edited in the admin"
+
+
+def test_rebuild_ratings_command_repairs_drift(product):
+    baker.make(Review, product=product, rating=5)
+    baker.make(Review, product=product, rating=2)
+    Product.objects.update(rating_count=0, rating_sum=0, rating_avg=0)
+
+    call_command("rebuild_ratings", batch_size=1, stdout=StringIO())
+    assert rating_state(product) == (2, 7, 3.5)
+
+
+def test_products_can_be_ordered_by_rating(product_factory):
+    low = product_factory()
+    high = product_factory()
+    baker.make(Review, product=low, rating=2)
+    baker.make(Review, product=high, rating=5)
+    ordered = list(Product.objects.order_by("-rating_avg"))
+    assert ordered[:2] == [high, low]
@@ -1,7 +1,11 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
 from django.urls import reverse
 from model_bakery import baker
 from products.models import Category, Product
+from products.search import get_search_backend
 
 pytestmark = pytest.mark.django_db
 
@@ -75,3 +79,46 @@ def test_search_with_category_filter(client):
     assert resp.status_code == 200
     assert b"BookTitle" in resp.content
     assert b"ToyTitle" not in resp.content
+
+
+# --- Search backend tests ---
+
+
+def search_names(query):
+    backend = get_search_backend()
+    return [p.name for p in backend.search(Product.objects.all(), query)]
+
+
+def test_search_ranks_name_matches_above_description_matches():
+    baker.make(Product, name="Plain Mug", description="Goes well with a lamp")
+    baker.make(Product, name="Desk Lamp", description="Bright")
+    assert search_names("lamp") == ["Desk Lamp", "Plain Mug"]
+
+
+def test_search_index_follows_product_and_category_changes():
+    cat = baker.make(Category, name="Gadgets")
+    product = baker.make(Product, name="Gizmo", category=cat)
+    assert search_names("Gizmo") == ["Gizmo"]
+
+    product.name = "Doohickey"
+    product.save()
+    assert search_names("Gizmo") == []
+    assert search_names("Doohickey") == ["Doohickey"]
+
+    cat.name = "Widgets"
+    cat.save()
+    assert search_names("Widgets") == ["Doohickey"]
+
+    product.delete()
+    assert search_names("Doohickey") == []
+
+
+def test_search_short_terms_fall_back_to_substring_match():
+    baker.make(Product, name="4K TV")
+    assert search_names("TV") == ["4K TV"]
+
+
+def test_search_rebuild_command(db):
+    baker.make(Product, name="Rebuilt Thing")
+    call_command("rebuild_search_index", stdout=StringIO())
+    assert search_names("Rebuilt") == ["Rebuilt Thing"]
@@ -1,11 +1,35 @@
 from django.urls import path
 
+from .conditional import (
+    product_detail_condition,
+    product_freshness,
+    product_list_condition,
+)
+from .page_cache import cache_anonymous_page
 from .views import ProductDetailView, ProductListView, add_review, delete_review
 
 app_name = "products"
 urlpatterns = [
-    path("", ProductListView.as_view(), name="index"),
-    path("<slug:slug>/", ProductDetailView.as_view(), name="product_detail"),
+    path(
+        "",
+        product_list_condition(
+            cache_anonymous_page(
+                ProductListView.as_view(), params=("q", "category", "cursor", "page")
+            )
+        ),
+        name="index",
+    ),
+    path(
+        "<slug:slug>/",
+        product_detail_condition(
+            cache_anonymous_page(
+                ProductDetailView.as_view(),
+                params=("reviews_page",),
+                freshness=product_freshness,
+            )
+        ),
+        name="product_detail",
+    ),
     path("<slug:product_slug>/review/", add_review, name="add_review"),
     path("review/<int:review_id>/delete/", delete_review, name="delete_review"),
 ]
@@ -1,18 +1,24 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import EmptyPage
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseForbidden
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Case, Count, Q, When, Window
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, ListView
 
-from .models import Category, Product, Review
+from users.models import Wishlist
+
+from .category_tree import get_category_tree
+from .models import Product, Review
+from .pagination import keyset_page
+from .search import get_search_backend
 
 
 class ProductListView(ListView):
     model = Product
+    queryset = Product.objects.with_card_data()
     template_name = "products/index.html"
     context_object_name = "products"
     paginate_by = 12  # Set number of products per page
@@ -23,32 +29,49 @@ class ProductListView(ListView):
         category_slug = self.request.GET.get("category")
         search_query = self.request.GET.get("q", "").strip()
 
-        # Filter by category if provided
+        # Filter by category if provided: the category and its whole subtree,
+        # as one indexed prefix match on the materialized path. Inactive
+        # categories below it hide their own branches.
         if category_slug:
-            category = get_object_or_404(Category, slug=category_slug)
-            if category.is_parent:
-                # If it's a parent category, include products from all its subcategories
-                subcategory_ids = category.children.filter(is_active=True).values_list(
-                    "id", flat=True
-                )
-                queryset = queryset.filter(
-                    Q(category=category) | Q(category_id__in=subcategory_ids)
-                )
-            else:
-                # If it's a subcategory, just show products from that subcategory
-                queryset = queryset.filter(category=category)
-
-        # Filter by search query if provided
+            category = self.get_category()
+            subtree = Q(category__path__startswith=category.path)
+            for node in get_category_tree().descendants(category):
+                if not node.is_active:
+                    subtree &= ~Q(category__path__startswith=node.path)
+            queryset = queryset.filter(subtree)
+
+        # Search product name, description and category name, ranked by relevance
         if search_query:
-            # Search in product name, description, and category name
-            queryset = queryset.filter(
-                Q(name__icontains=search_query)
-                | Q(description__icontains=search_query)
-                | Q(category__name__icontains=search_query)
-            ).distinct()
+            queryset = get_search_backend().search(queryset, search_query)
 
         return queryset
 
+    def get_category(self):
+        """The category node selected by ``?category=<slug>`` (from the cached tree)."""
+        category = get_category_tree().get(self.request.GET.get("category"))
+        if category is None:
+            raise Http404("No category matches the given query.")
+        return category
+
+    def uses_keyset_pagination(self):
+        """Keyset pagination serves the default newest-first listing.
+
+        Search results are ranked by relevance and explicit ``?page=`` links
+        keep working, so both go through the regular paginator.
+        """
+        params = self.request.GET
+        return not params.get("q", "").strip() and "page" not in params
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate by cursor when possible (no OFFSET scan, no COUNT query)."""
+        self.next_cursor = None
+        if not self.uses_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        products, has_more, self.next_cursor = keyset_page(
+            queryset, self.request.GET.get("cursor"), page_size
+        )
+        return None, None, products, has_more
+
     def render_to_response(self, context, **response_kwargs):
         # Use the same AJAX detection as in cart views (for pagination)
         wants_json = (
@@ -58,44 +81,41 @@ class ProductListView(ListView):
             html = render_to_string(
                 "products/_product_list.html", context, request=self.request
             )
-            return HttpResponse(html)
+            response = HttpResponse(html)
+            response["X-Has-More"] = "true" if context["has_more"] else "false"
+            response["X-Next-Cursor"] = context["next_cursor"] or ""
+            return response
         return super().render_to_response(context, **response_kwargs)
 
     def get_context_data(self, **kwargs):
         """Provide context data including pagination info and search query."""
         context = super().get_context_data(**kwargs)
-        context["has_more"] = self.has_next_page(context["page_obj"])
+        if context["page_obj"] is None:
+            context["has_more"] = context["is_paginated"]
+        else:
+            context["has_more"] = self.has_next_page(context["page_obj"])
+        context["next_cursor"] = self.next_cursor
 
         # Add current category to context if filtering by category
-        category_slug = self.request.GET.get("category")
-        if category_slug:
-            context["current_category"] = get_object_or_404(
-                Category, slug=category_slug
-            )
+        if self.request.GET.get("category"):
+            tree = get_category_tree()
+            category = context["current_category"] = self.get_category()
 
-            # If this is a parent category, get its subcategories
-            if context["current_category"].is_parent:
-                context["subcategories"] = context["current_category"].children.filter(
-                    is_active=True
-                )
+            context["category_ancestors"] = tree.ancestors(category)
+            context["subcategories"] = category.active_children
             # If this is a subcategory, get its parent
-            elif context["current_category"].parent:
-                context["parent_category"] = context["current_category"].parent
-                context["sibling_categories"] = (
-                    context["current_category"]
-                    .parent.children.filter(is_active=True)
-                    .exclude(id=context["current_category"].id)
-                )
+            if not category.is_parent:
+                context["parent_category"] = tree.parent(category)
+                context["sibling_categories"] = tree.siblings(category)
 
         # Add search query to context for template
         context["search_query"] = self.request.GET.get("q", "").strip()
 
         # Check if products are in the user's wishlist
         if self.request.user.is_authenticated:
-            wishlist_product_ids = set(
-                self.request.user.wishlist.values_list("product_id", flat=True)
+            context["wishlist_product_ids"] = Wishlist.product_ids_for_request(
+                self.request
             )
-            context["wishlist_product_ids"] = wishlist_product_ids
 
         return context
 
@@ -115,54 +135,111 @@ class ProductListView(ListView):
             return False
 
 
+def get_detail_product(request, slug):
+    """The product of a detail page, loaded once per request.
+
+    Shared by the conditional GET validators and ``ProductDetailView``;
+    ``None`` when no product has this slug.
+    """
+    if not hasattr(request, "_detail_product"):
+        request._detail_product = (
+            Product.objects.with_detail_data().filter(slug=slug).first()
+        )
+    return request._detail_product
+
+
 class ProductDetailView(DetailView):
     model = Product
     template_name = "products/product_detail.html"
     context_object_name = "product"
     slug_field = "slug"
     slug_url_kwarg = "slug"
+    reviews_per_page = 10
+
+    def get_object(self, queryset=None):
+        product = get_detail_product(self.request, self.kwargs[self.slug_url_kwarg])
+        if product is None:
+            raise Http404("No product matches the given query.")
+        return product
 
     def get_context_data(self, **kwargs):
         """Provide enhanced context data for product detail."""
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
 
         # Get related products from the same category
-        related_products = Product.objects.filter(
-            category=product.category, is_available=True
-        ).exclude(id=product.id)[:4]
+        related_products = (
+            Product.objects.with_card_data()
+            .filter(category=product.category, is_available=True)
+            .exclude(id=product.id)[:4]
+        )
 
         # Add to context
         context["related_products"] = related_products
+        # Thumbnails, cover image first
+        context["images"] = list(product.images.order_by("-is_primary", "pk"))
+
+        # Category and parent come with the product; deeper ancestors from the tree
+        category = context["category"] = product.category
+        tree = get_category_tree()
+        node = tree.by_id.get(category.pk)
+        context["category_ancestors"] = tree.ancestors(node) if node else []
+        if category.parent is not None:
+            context["parent_category"] = category.parent
+
+        reviews_page = self.paginate_reviews(product)
+        context["reviews_page"] = reviews_page
+        context["reviews"] = reviews_page.object_list
+        context["review_count"] = reviews_page.paginator.count
 
-        # Add category information for breadcrumbs
-        context["category"] = product.category
-        if product.category.parent:
-            context["parent_category"] = product.category.parent
-
-        # Get product reviews with pagination
-        reviews = product.reviews.all().select_related("user")
-        context["reviews"] = reviews
-        context["review_count"] = reviews.count()
-
-        # Check if current user has already reviewed this product
         if self.request.user.is_authenticated:
-            context["user_review"] = product.reviews.filter(
-                user=self.request.user
-            ).first()
-            # Check if product is in user's wishlist
-            context["in_wishlist"] = self.request.user.wishlist.filter(
-                product=product
-            ).exists()
-
-            # Also check for related products
-            wishlist_product_ids = set(
-                self.request.user.wishlist.values_list("product_id", flat=True)
-            )
+            context["user_review"] = self.get_user_review(product, reviews_page)
+            # Wishlist state of this product and the related ones (one query)
+            wishlist_product_ids = Wishlist.product_ids_for_request(self.request)
+            context["in_wishlist"] = product.pk in wishlist_product_ids
             context["wishlist_product_ids"] = wishlist_product_ids
 
         return context
 
+    def paginate_reviews(self, product):
+        """One page of reviews (``?reviews_page=``) and their total, in one query.
+
+        The total is a window count over the product's reviews; the user's own
+        review is listed first.
+        """
+        try:
+            number = int(self.request.GET.get("reviews_page", 1))
+        except ValueError:
+            raise Http404("Invalid reviews page.")
+        if number < 1:
+            raise Http404("Invalid reviews page.")
+
+        ordering = ["-created_at", "-id"]  # id keeps equal timestamps in a stable order
+        if self.request.user.is_authenticated:
+            own_first = Case(When(user=self.request.user, then=0), default=1)
+            ordering.insert(0, own_first)
+        start = (number - 1) * self.reviews_per_page
+        reviews = list(
+            product.reviews.select_related("user")
+            .annotate(total=Window(Count("pk")))
+            .order_by(*ordering)[start : start + self.reviews_per_page]
+        )
+        if not reviews and number > 1:
+            raise Http404("Invalid reviews page.")
+
+        paginator = Paginator((), self.reviews_per_page)
+        paginator.count = reviews[0].total if reviews else 0
+        return Page(reviews, number, paginator)
+
+    def get_user_review(self, product, reviews_page):
+        """The user's review: first on page one, looked up on other pages."""
+        if reviews_page.number == 1:
+            reviews = reviews_page.object_list
+            if reviews and reviews[0].user_id == self.request.user.pk:
+                return reviews[0]
+            return None
+        return product.reviews.filter(user=self.request.user).first()
+
 
 @login_required
 @require_POST
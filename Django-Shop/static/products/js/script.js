@@ -4,6 +4,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const spinner = document.getElementById('loading-spinner');
     const container = document.getElementById('products-container');
     let hasMore = container.dataset.hasMore === "true";
+    // Cursor of the last loaded product; empty when the list is page-numbered (e.g. search)
+    let nextCursor = container.dataset.nextCursor || '';
 
     // Throttled Scroll Event Listener for Efficiency
     const onScroll = throttle(() => {
@@ -33,8 +35,13 @@ document.addEventListener('DOMContentLoaded', () => {
         const url = new URL(window.location.href);
         const searchParams = url.searchParams;
         
-        // Update or add the page parameter
-        searchParams.set('page', page);
+        // Follow the cursor when the server provides one, else request the page number
+        if (nextCursor) {
+            searchParams.set('cursor', nextCursor);
+            searchParams.delete('page');
+        } else {
+            searchParams.set('page', page);
+        }
         
         // Return only the path and query params (not the full URL)
         return `${url.pathname}${url.search}`;
@@ -59,13 +66,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 container.insertAdjacentHTML('beforeend', html);
                 // advance currentPage only after successful insert
                 currentPage = nextPage;
-                // Count how many product items were just fetched
-                const tempDiv = document.createElement('div');
-                tempDiv.innerHTML = html;
-                const fetchedItems = tempDiv.querySelectorAll('.product-item').length;
-                console.log('Fetched HTML:', html);
-                console.log('Fetched product items:', fetchedItems);
-                if (fetchedItems < 12) {
+                nextCursor = response.headers.get('X-Next-Cursor') || '';
+                if (response.headers.get('X-Has-More') !== 'true') {
                     hasMore = false;
                     window.removeEventListener('scroll', onScroll);
                 }
@@ -196,3 +196,15 @@ class Wishlist(models.Model):
 
     def __str__(self):
         return f"{self.user.email}'s wishlist - {self.product.name}"
+
+    @classmethod
+    def product_ids_for_request(cls, request) -> frozenset:
+        """Wishlisted product ids of the request's user, memoized on the request."""
+        if not hasattr(request, "_wishlist_product_ids"):
+            user = request.user
+            request._wishlist_product_ids = frozenset(
+                cls.objects.filter(user=user).values_list("product_id", flat=True)
+                if user.is_authenticated
+                else ()
+            )
+        return request._wishlist_product_ids
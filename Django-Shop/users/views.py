@@ -2,12 +2,15 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db import IntegrityError
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, ListView, UpdateView, View
 
+from products.models import Product
+
 from .exceptions import CannotDeleteOnlyAddress
 from .forms import AddressForm, ProfileForm
 from .models import Address, Wishlist
@@ -116,7 +119,9 @@ class WishlistView(LoginRequiredMixin, ListView):
     context_object_name = "wishlist_items"
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch("product", queryset=Product.objects.with_card_data())
+        )
 
 
 class RemoveFromWishlistView(LoginRequiredMixin, View):
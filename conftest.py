@@ -1,14 +1,32 @@
+from contextlib import contextmanager
 from uuid import uuid4
 
 import pytest
 from cart.models import Cart
+from config.middleware import QueryRecorder
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from model_bakery import baker
 from products.models import Category, Product
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached values (cart summaries, home page lists) must not leak across tests."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def no_page_cache(settings):
+    """Render anonymous catalog pages on every request (measures the views)."""
+    settings.PAGE_CACHE_TIMEOUT = 0
+
+
 @pytest.fixture
 def user(db):
     return baker.make(
@@ -63,3 +81,28 @@ def ajax(client):
         return client.post(url, data or {}, **headers)
 
     return _post
+
+
+@pytest.fixture
+def query_budget(db):
+    """Fail when the wrapped block runs more than ``max_queries`` queries.
+
+    Usage: ``with query_budget(8): client.get(url)``. The failure message lists
+    every query, with repeated statements first.
+    """
+
+    @contextmanager
+    def _budget(max_queries):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            yield recorder
+        if recorder.count > max_queries:
+            repeated = "".join(
+                f"\n  {n}x {sql}" for sql, n in recorder.fingerprints.most_common()
+            )
+            pytest.fail(
+                f"{recorder.count} queries exceeded the budget of {max_queries} "
+                f"({recorder.duplicate_count} duplicates):{repeated}"
+            )
+
+    return _budget